@@ -0,0 +1,133 @@
+"""Time-windowed spending analytics
+
+Everything here works on a category x day matrix of spending totals (kept
+by CategoryAggregator for dated expenses), so the cost grows with the
+length of the history and the number of categories, never with the
+number of expenses. Days are bucketed into Monday-based weeks and
+calendar months with a single reduceat per bucket size. "Last month" is
+the last calendar month the history fully covers.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Complete months averaged for the "usual" spending last month is compared to
+ROLLING_MONTHS = 3
+
+# A week this many standard deviations above a category's mean is a spike
+SPIKE_Z_SCORE = 3.0
+
+# Most recent spikes reported
+MAX_SPIKES = 5
+
+# Trailing window for the daily average, in days
+DAILY_WINDOW = 30
+
+
+def _parse_day(value) -> np.datetime64:
+    try:
+        return np.datetime64(value, "D")
+    except (TypeError, ValueError):
+        return np.datetime64("NaT", "D")
+
+
+def parse_days(dates) -> np.ndarray:
+    """ISO date strings to datetime64[D], NaT when missing or unparseable"""
+    try:
+        return np.asarray(dates, dtype="datetime64[D]")
+    except (TypeError, ValueError):
+        # Only pay for the per-value parse when some date is not ISO
+        return np.array([_parse_day(value) for value in dates], dtype="datetime64[D]")
+
+
+def _bucket(daily: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum the day columns sharing a (sorted) bucket key"""
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(daily, starts, axis=1)
+
+
+def _percent_change(current: np.ndarray, reference: np.ndarray) -> List[Optional[int]]:
+    """Rounded percentage change, None where there is nothing to compare to"""
+    change = np.divide(current - reference, reference, out=np.zeros_like(current), where=reference > 0)
+    return [round(value * 100) if base > 0 else None for value, base in zip(change.tolist(), reference.tolist())]
+
+
+def spending_trends(daily: np.ndarray, origin: int, categories: List[str]) -> Dict:
+    """Monthly, weekly and daily statistics per category
+
+    ``daily[c, d]`` is the spending of ``categories[c]`` on epoch day
+    ``origin + d``.
+    """
+    epoch_days = np.arange(origin, origin + daily.shape[1])
+    months = epoch_days.astype("datetime64[D]").astype("datetime64[M]")
+    month_keys, monthly = _bucket(daily, months.astype(np.int64))
+    # 1970-01-01 was a Thursday, so shifting by 3 makes weeks start on Monday
+    week_keys, weekly = _bucket(daily, (epoch_days + 3) // 7)
+
+    # Month comparisons use complete months only; a history that ends (or
+    # starts) mid-month would otherwise always look like a drop in spending
+    covered = np.bincount(months.astype(np.int64) - month_keys[0], minlength=len(month_keys))
+    first_days = month_keys.astype("datetime64[M]")
+    days_in_month = ((first_days + 1).astype("datetime64[D]") - first_days.astype("datetime64[D]")).astype(np.int64)
+    complete = covered == days_in_month
+    full_keys, full = month_keys[complete], monthly[:, complete]
+    empty = np.zeros(daily.shape[0])
+
+    last_month = full[:, -1] if full.shape[1] else empty
+    previous_month = full[:, -2] if full.shape[1] > 1 else empty
+    # Rolling mean of the complete months before the last one, from the cumulative sum
+    window = min(ROLLING_MONTHS, full.shape[1] - 1)
+    if window > 0:
+        cumulative = np.cumsum(full, axis=1)
+        before = cumulative[:, -window - 2] if full.shape[1] > window + 1 else 0.0
+        rolling_average = (cumulative[:, -2] - before) / window
+    else:
+        rolling_average = empty
+    month_to_date = monthly[:, -1] if not complete[-1] else empty
+    daily_average = daily[:, -DAILY_WINDOW:].sum(axis=1) / min(DAILY_WINDOW, daily.shape[1])
+
+    month_over_month = _percent_change(last_month, previous_month)
+    vs_average = _percent_change(last_month, rolling_average)
+    per_category = [
+        {
+            "category": category,
+            "last_month": round(current, 2),
+            "previous_month": round(previous, 2),
+            "month_over_month": change,
+            "rolling_average": round(average, 2),
+            "vs_average": versus,
+            "month_to_date": round(so_far, 2),
+            "daily_average": round(per_day, 2),
+        }
+        for category, current, previous, change, average, versus, so_far, per_day in zip(
+            categories, last_month.tolist(), previous_month.tolist(), month_over_month,
+            rolling_average.tolist(), vs_average, month_to_date.tolist(), daily_average.tolist())
+    ]
+
+    # Weekly z-scores per category; flat categories have no spikes
+    mean = weekly.mean(axis=1, keepdims=True)
+    std = weekly.std(axis=1, keepdims=True)
+    z_scores = np.divide(weekly - mean, std, out=np.zeros_like(weekly), where=std > 0)
+    rows, columns = np.nonzero(z_scores >= SPIKE_Z_SCORE)
+    recent = np.argsort(-columns, kind="stable")[:MAX_SPIKES]
+    week_starts = (week_keys * 7 - 3).astype("datetime64[D]")
+    spikes = [
+        {
+            "category": categories[row],
+            "week": str(week_starts[column]),
+            "amount": round(float(weekly[row, column]), 2),
+            "usual": round(float(mean[row, 0]), 2),
+            "z_score": round(float(z_scores[row, column]), 1),
+        }
+        for row, column in zip(rows[recent].tolist(), columns[recent].tolist())
+    ]
+
+    return {
+        "start": str(epoch_days[0].astype("datetime64[D]")),
+        "end": str(epoch_days[-1].astype("datetime64[D]")),
+        "last_month": str(full_keys[-1].astype("datetime64[M]")) if len(full_keys) else None,
+        "months": len(month_keys),
+        "weeks": len(week_keys),
+        "categories": per_category,
+        "spikes": spikes,
+    }
@@ -0,0 +1,717 @@
+"""Offline benchmark suite for the FinVoice ML service
+
+Everything runs in-process: endpoints are exercised through FastAPI's
+TestClient (no server or network needed) and core classes are called
+directly. Each scenario reports throughput and latency percentiles.
+
+    python benchmark.py                 run every scenario
+    python benchmark.py -k advice       only scenarios whose name contains "advice"
+    python benchmark.py --update        store the results as the new baselines
+    python benchmark.py --check         fail if p50 regressed past --threshold
+    python benchmark.py --load          also run the /categorize load test
+    python benchmark.py --scaling       also measure serve.py scaling across cores
+    python benchmark.py --voice-stream  also measure the voice WebSocket under many connections
+    python benchmark.py --statement     also import a 1M-row statement and report rows/s and memory
+
+Baselines live in benchmark_baselines.json and are machine specific;
+regenerate them with --update on the machine that runs --check.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINES_PATH = os.path.join(HERE, "benchmark_baselines.json")
+
+# Default allowed p50 slowdown against the baseline before --check fails
+DEFAULT_THRESHOLD = 0.25
+
+# Scenario name -> (setup returning the callable to time, absolute p50 budget in ms)
+SCENARIOS: Dict[str, tuple] = {}
+
+
+def scenario(name: str, budget_ms: Optional[float] = None):
+    """Register a benchmark; the decorated setup function returns the call to time"""
+    def register(setup: Callable[[], Callable[[], Any]]):
+        SCENARIOS[name] = (setup, budget_ms)
+        return setup
+    return register
+
+
+def _client():
+    """In-process client with the response cache off, so work is measured"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    main.response_cache.maxsize = 0
+    offloader = main.get_offloader()
+    offloader.shutdown()
+    offloader.max_workers = 0  # keep predictions in-process for stable timings
+    return TestClient(main.app)
+
+
+def _expenses(count: int) -> List[Dict]:
+    names = ["food", "travel", "bills", "entertainment", "shopping", "health"]
+    return [{"category": names[i % len(names)], "amount": float(i % 500), "description": f"item {i}"}
+            for i in range(count)]
+
+
+def _startup(code: str, role: str = "all"):
+    """Run ``code`` in a fresh interpreter, as a newly scheduled worker would"""
+    env = dict(os.environ, WORKER_ROLE=role, PREDICTION_WORKERS="0")
+    command = [sys.executable, "-c", code]
+    return lambda: subprocess.run(command, env=env, cwd=HERE, check=True)
+
+
+# Cold start budgets, so autoscaled workers become ready well under a second
+scenario("startup.import_main", budget_ms=750.0)(lambda: _startup("import main"))
+scenario("startup.ready_parse", budget_ms=1000.0)(lambda: _startup("import main; main.warm_up()", "parse"))
+scenario("startup.ready_predict", budget_ms=1000.0)(lambda: _startup("import main; main.warm_up()", "predict"))
+
+
+@scenario("endpoint.categorize")
+def _():
+    client = _client()
+    return lambda: client.post("/categorize", json={"text": "add dinner at restaurant 300"})
+
+
+@scenario("endpoint.categorize_cached")
+def _():
+    import main
+
+    client = _client()
+    main.response_cache.maxsize = 4096
+    return lambda: client.post("/categorize", json={"text": "add coffee 150"})
+
+
+@scenario("endpoint.categorize_batch_1k")
+def _():
+    client = _client()
+    texts = [f"add {word} {i}" for i, word in zip(range(1000), ["uber", "coffee", "netflix", "rent"] * 250)]
+    return lambda: client.post("/categorize/batch", json={"texts": texts})
+
+
+@scenario("endpoint.parse_voice_input")
+def _():
+    client = _client()
+    return lambda: client.post("/parse-voice-input", json={"text": "add taxi 150"})
+
+
+def _advice_scenario(count: int):
+    client = _client()
+    body = json.dumps({"user_query": "how can I save?", "financial_data": {"expenses": _expenses(count)}})
+    headers = {"content-type": "application/json"}
+    return lambda: client.post("/financial-advice", content=body, headers=headers)
+
+
+scenario("endpoint.financial_advice_10")(lambda: _advice_scenario(10))
+scenario("endpoint.financial_advice_1k")(lambda: _advice_scenario(1000))
+scenario("endpoint.financial_advice_100k")(lambda: _advice_scenario(100000))
+
+
+@scenario("endpoint.financial_advice_100k_columnar")
+def _():
+    client = _client()
+    expenses = _expenses(100000)
+    body = json.dumps({"user_query": "how can I save?", "financial_data": {
+        "amounts": [e["amount"] for e in expenses], "categories": [e["category"] for e in expenses]}})
+    headers = {"content-type": "application/json"}
+    return lambda: client.post("/financial-advice", content=body, headers=headers)
+
+
+def _dated_columns(count: int = 100000, years: int = 5):
+    """Columnar expenses spread evenly over ``years`` of daily history"""
+    import numpy as np
+
+    names = ["food", "travel", "bills", "entertainment", "shopping", "health"]
+    days = np.datetime64("2020-01-01") + np.arange(count) * (years * 365) // count
+    return ([names[i % len(names)] for i in range(count)], [float(i % 500) for i in range(count)],
+            [str(day) for day in days])
+
+
+# Five years of history must fit the advice latency budget in one pass
+@scenario("analytics.trends_5y_100k", budget_ms=100.0)
+def _():
+    from spending import CategoryAggregator
+
+    categories, amounts, dates = _dated_columns()
+
+    def run():
+        aggregator = CategoryAggregator()
+        aggregator.add(categories, amounts, dates)
+        return aggregator.trends()
+    return run
+
+
+@scenario("endpoint.financial_advice_5y_100k_dated", budget_ms=250.0)
+def _():
+    client = _client()
+    categories, amounts, dates = _dated_columns()
+    body = json.dumps({"user_query": "how can I save?", "financial_data": {
+        "amounts": amounts, "categories": categories, "dates": dates}})
+    headers = {"content-type": "application/json"}
+    return lambda: client.post("/financial-advice", content=body, headers=headers)
+
+
+# Dozens of goals under hundreds of what-if scenarios, solved as one grid
+@scenario("goals.project_50x500", budget_ms=50.0)
+def _():
+    from datetime import date
+
+    from goals import project_goals
+
+    kinds = ["savings", "stocks", "gold"]
+    goals = [{"name": f"goal {i}", "target_amount": 10000.0 * (i + 1), "saved": 500.0 * i,
+              "deadline": date(2027 + i % 10, 1 + i % 12, 1) if i % 3 else None, "investment_type": kinds[i % 3]}
+             for i in range(50)]
+    scenarios = [{"name": f"what-if {i}", "extra_savings": 10.0 * i, "spending_cut": (i % 10) / 20,
+                  "return_shift": (i % 5 - 2) / 100} for i in range(500)]
+    spending = {"food": 8000.0, "travel": 3000.0, "bills": 5000.0, "entertainment": 2000.0, "shopping": 4000.0}
+    returns = {"savings": 0.04, "stocks": 0.12, "gold": 0.08}
+    return lambda: project_goals(goals, spending, 20000.0, returns, scenarios, today=date(2026, 1, 1))
+
+
+def _statement_lines(count: int):
+    """CSV statement lines: a header, then ``count`` day-first dated transactions"""
+    merchants = ["UPI/SWIGGY", "UBER TRIP", "NETFLIX.COM", "RENT TRANSFER", "AMAZON PAY", "SALARY CREDIT"]
+    yield "Txn Date,Narration,Withdrawal Amt.,Deposit Amt.,Balance\n"
+    for i in range(count):
+        amount = f"{100 + i % 500}.00"
+        debit, credit = ("", amount) if i % 6 == 5 else (amount, "")
+        yield f"{1 + i % 28:02d}/{1 + i // 28 % 12:02d}/2024,{merchants[i % 6]}/{i},{debit},{credit},0\n"
+
+
+@scenario("endpoint.import_statement_10k")
+def _():
+    client = _client()
+    body = "".join(_statement_lines(10000)).encode()
+    return lambda: client.post("/import-statement", files={"file": ("statement.csv", body, "text/csv")})
+
+
+def _codec_parse(count: int, columnar: bool):
+    """Request body to validated model, as FastAPI does it (json.loads, then validate)"""
+    import main
+
+    expenses = _expenses(count)
+    if columnar:
+        data = {"amounts": [e["amount"] for e in expenses], "categories": [e["category"] for e in expenses]}
+    else:
+        data = {"expenses": expenses}
+    body = json.dumps({"user_query": "help", "financial_data": data}).encode()
+    return lambda: main.AdviceRequest.model_validate(json.loads(body))
+
+
+def _codec_serialize(count: int, fast: bool):
+    """Encode a batch categorize response with FastAPI's default encoder or codec.dumps"""
+    from fastapi.encoders import jsonable_encoder
+
+    import codec
+
+    content = {"results": [{"description": e["description"], "amount": e["amount"], "category": e["category"]}
+                           for e in _expenses(count)]}
+    if fast:
+        return lambda: codec.dumps(content)
+    return lambda: json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+for _count, _label in ((1000, "1k"), (10000, "10k"), (100000, "100k")):
+    scenario(f"codec.parse_rows_{_label}")(lambda count=_count: _codec_parse(count, columnar=False))
+    scenario(f"codec.parse_columnar_{_label}")(lambda count=_count: _codec_parse(count, columnar=True))
+    scenario(f"codec.serialize_default_{_label}")(lambda count=_count: _codec_serialize(count, fast=False))
+    scenario(f"codec.serialize_fast_{_label}")(lambda count=_count: _codec_serialize(count, fast=True))
+
+
+@scenario("endpoint.predict_investment")
+def _():
+    client = _client()
+    return lambda: client.post("/predict-investment", json={"investment_amount": 50000, "investment_type": "stocks"})
+
+
+@scenario("endpoint.predict_investment_batch_200")
+def _():
+    client = _client()
+    body = {"investment_amounts": [10000 + i for i in range(200)],
+            "investment_types": ["stocks", "gold"] * 100}
+    return lambda: client.post("/predict-investment/batch", json=body)
+
+
+@scenario("predictor.predict_stock_returns")
+def _():
+    from predictor import InvestmentPredictor
+
+    predictor = InvestmentPredictor()
+    return lambda: predictor.predict_stock_returns(50000)
+
+
+@scenario("predictor.predict_gold_returns")
+def _():
+    from predictor import InvestmentPredictor
+
+    predictor = InvestmentPredictor()
+    return lambda: predictor.predict_gold_returns(10000)
+
+
+@scenario("predictor.predict_batch_1k")
+def _():
+    from predictor import InvestmentPredictor
+
+    predictor = InvestmentPredictor()
+    amounts = [10000.0 + i for i in range(1000)]
+    types = ["stocks", "gold"] * 500
+    timeframes = ["1 year"] * 1000
+    return lambda: predictor.predict_batch(amounts, types, timeframes)
+
+
+# 10k paths x 60 months must finish within a few milliseconds
+@scenario("predictor.simulate_10k_x_60m", budget_ms=15.0)
+def _():
+    from predictor import InvestmentPredictor
+
+    predictor = InvestmentPredictor()
+    return lambda: predictor.simulate_returns(10000, "stocks", "60 months", 10000, seed=0)
+
+
+@scenario("categorizer.categorize")
+def _():
+    from categorizer import ExpenseCategorizer
+
+    categorizer = ExpenseCategorizer()
+    return lambda: categorizer.categorize("monthly gym membership at the fitness club")
+
+
+@scenario("categorizer.categorize_many_10k")
+def _():
+    from categorizer import ExpenseCategorizer
+
+    categorizer = ExpenseCategorizer()
+    descriptions = [f"{word} payment {i}" for i, word in
+                    zip(range(10000), ["uber", "coffee", "netflix", "rent", "unknown"] * 2000)]
+    return lambda: categorizer.categorize_many(descriptions)
+
+
+@scenario("categorizer.parse_voice_input")
+def _():
+    from categorizer import ExpenseCategorizer
+
+    categorizer = ExpenseCategorizer()
+    return lambda: categorizer.parse_voice_input("add dinner 300")
+
+
+@scenario("utterance.split_stream_100")
+def _():
+    from utterance import UtteranceSplitter
+
+    # A dictated list of 100 items arriving in 8-character fragments
+    transcript = " and ".join(f"add item {i} {100 + i}" for i in range(100))
+    fragments = [transcript[i:i + 8] for i in range(0, len(transcript), 8)]
+
+    def run():
+        splitter = UtteranceSplitter()
+        done = [utterance for fragment in fragments for utterance in splitter.feed(fragment)]
+        return done + splitter.flush()
+    return run
+
+
+def _category_model(path: str = "/tmp/finvoice_bench_model.npz"):
+    """Train a small model from the shipped keyword rules and memory-map it back"""
+    from categorizer import ExpenseCategorizer
+    from category_model import CategoryModel
+
+    categories = ExpenseCategorizer().categories
+    texts = [f"{prefix}{keyword}" for keywords in categories.values() for keyword in keywords
+             for prefix in ("", "paid for ", "monthly ")]
+    labels = [name for name, keywords in categories.items() for _ in keywords for _ in range(3)]
+    CategoryModel.train(texts, labels, epochs=5).save(path)
+    return CategoryModel.load(path), path
+
+
+@scenario("category_model.predict_10k")
+def _():
+    model, _ = _category_model()
+    descriptions = [f"{word} payment {i}" for i, word in
+                    zip(range(10000), ["uber", "coffee", "netflix", "rent", "unknown"] * 2000)]
+    return lambda: model.predict(descriptions)
+
+
+@scenario("categorizer.categorize_many_10k_with_model")
+def _():
+    from categorizer import ExpenseCategorizer
+
+    _, path = _category_model()
+    categorizer = ExpenseCategorizer(model_path=path)
+    descriptions = [f"{word} payment {i}" for i, word in
+                    zip(range(10000), ["uber", "coffee", "netflix", "rent", "unknown"] * 2000)]
+    return lambda: categorizer.categorize_many(descriptions)
+
+
+UTTERANCES = ["add dinner at restaurant 300", "spent ₹1,200 on electricity bill", "add 5k rent",
+              "paid 45.50 for coffee", "uber 150", "add address change fee 150"]
+
+
+@scenario("utterance.parse")
+def _():
+    from utterance import parse_utterance
+
+    return lambda: parse_utterance("spent ₹1,200 on electricity bill")
+
+
+@scenario("utterance.parse_10k")
+def _():
+    from utterance import parse_utterance
+
+    texts = UTTERANCES * (10000 // len(UTTERANCES))
+    return lambda: [parse_utterance(text) for text in texts]
+
+
+@scenario("spending.aggregate_100k")
+def _():
+    from spending import aggregate_by_category
+
+    expenses = _expenses(100000)
+    return lambda: aggregate_by_category(expenses).totals()
+
+
+def measure(call: Callable[[], Any], min_time: float = 0.5, min_iterations: int = 5,
+            max_iterations: int = 20000) -> Dict[str, float]:
+    """Time ``call`` repeatedly and summarize the per-call latencies"""
+    call()  # warm up
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_iterations:
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+        if len(latencies) >= min_iterations and time.perf_counter() - started >= min_time:
+            break
+    samples = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]).tolist()
+    return {"iterations": len(latencies), "ops_per_sec": len(latencies) / samples.sum() * 1000,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def run(names: List[str], min_time: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+    print(f"{'scenario':40} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name in names:
+        setup, _ = SCENARIOS[name]
+        result = results[name] = measure(setup(), min_time)
+        print(f"{name:40} {result['ops_per_sec']:10.1f} {result['p50_ms']:9.3f} "
+              f"{result['p95_ms']:9.3f} {result['p99_ms']:9.3f}")
+    return results
+
+
+def check(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Return a message for every scenario over its baseline or budget"""
+    failures = []
+    for name, result in results.items():
+        budget = SCENARIOS[name][1]
+        if budget is not None and result["p50_ms"] > budget:
+            failures.append(f"{name}: p50 {result['p50_ms']:.3f} ms is over its {budget:.1f} ms budget")
+        baseline = baselines.get(name)
+        if baseline and result["p50_ms"] > baseline["p50_ms"] * (1 + threshold):
+            failures.append(f"{name}: p50 {result['p50_ms']:.3f} ms vs baseline {baseline['p50_ms']:.3f} ms "
+                            f"(+{result['p50_ms'] / baseline['p50_ms'] - 1:.0%})")
+    return failures
+
+
+def percentile_ms(samples, q: float) -> float:
+    return float(np.percentile(samples, q)) * 1000
+
+
+def bench_categorize_under_prediction_load(workers: int, flood: int = 40, probes: int = 200) -> dict:
+    """/categorize latency while a flood of simulations is in flight
+
+    ``workers`` is the prediction pool size; 0 runs predictions on the
+    threadpool, sharing the GIL with the event loop.
+    """
+    import asyncio
+
+    import httpx
+
+    import main
+    from offload import PredictionOffloader
+
+    main.response_cache.maxsize = 0  # measure the work, not the cache
+    main.get_offloader().shutdown()
+    main.offloader = PredictionOffloader(main.get_predictor(), max_workers=workers, max_queue=flood)
+    main.offloader.warm_up()
+
+    async def run_load():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            simulation = {"investment_amount": 10000, "investment_type": "stocks",
+                          "timeframe": "10 years", "n_paths": 50000}
+            flood_tasks = [asyncio.create_task(client.post("/simulate-investment", json=simulation))
+                           for _ in range(flood)]
+            await asyncio.sleep(0)
+            latencies = []
+            for i in range(probes):
+                start = time.perf_counter()
+                await client.post("/categorize", json={"text": f"add coffee {i}"})
+                latencies.append(time.perf_counter() - start)
+            statuses = [response.status_code for response in await asyncio.gather(*flood_tasks)]
+            return latencies, statuses
+
+    latencies, statuses = asyncio.run(run_load())
+    main.offloader.shutdown()
+    result = {"p50_ms": percentile_ms(latencies, 50), "p99_ms": percentile_ms(latencies, 99),
+              "predictions_ok": statuses.count(200), "predictions_503": statuses.count(503)}
+    print(f"/categorize under prediction flood, workers={workers}: "
+          f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms "
+          f"({result['predictions_ok']} predictions ok, {result['predictions_503']} rejected)")
+    return result
+
+
+def _voice_frame(text: str, final: bool) -> str:
+    return json.dumps({"text": text, "final": final})
+
+
+def bench_voice_stream(connections: int, items_per_connection: int = 200, fragment_chars: int = 12) -> dict:
+    """Parsed items per second from the voice WebSocket, many connections on one event loop
+
+    Drives the ASGI app directly (one worker, no network): every connection
+    dictates ``items_per_connection`` expenses in small transcript fragments
+    and waits for all of them to come back.
+    """
+    import asyncio
+
+    import main
+
+    transcript = " and ".join(f"add coffee {100 + i % 50}" for i in range(items_per_connection))
+    frames = [_voice_frame(transcript[i:i + fragment_chars], final=False)
+              for i in range(0, len(transcript), fragment_chars)] + [_voice_frame("", final=True)]
+
+    async def connection():
+        inbox: asyncio.Queue = asyncio.Queue()
+        received = 0
+        finished = asyncio.Event()
+        scope = {"type": "websocket", "path": "/parse-voice-input/stream", "raw_path": b"/parse-voice-input/stream",
+                 "query_string": b"", "headers": [], "scheme": "ws", "server": ("bench", 80),
+                 "client": ("bench", 1), "root_path": "", "subprotocols": []}
+
+        async def receive():
+            return await inbox.get()
+
+        async def send(message):
+            nonlocal received
+            if message["type"] == "websocket.send":
+                received += 1
+                if received == items_per_connection:
+                    finished.set()
+            elif message["type"] == "websocket.close":
+                finished.set()
+
+        inbox.put_nowait({"type": "websocket.connect"})
+        for frame in frames:
+            inbox.put_nowait({"type": "websocket.receive", "text": frame})
+        app_task = asyncio.create_task(main.app(scope, receive, send))
+        await finished.wait()
+        inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await app_task
+        return received
+
+    async def run_load():
+        return await asyncio.gather(*(connection() for _ in range(connections)))
+
+    start = time.perf_counter()
+    items = sum(asyncio.run(run_load()))
+    elapsed = time.perf_counter() - start
+    result = {"connections": connections, "items": items, "items_per_sec": items / elapsed}
+    print(f"voice WebSocket, {connections} connections on one worker: {items} items in {elapsed:.2f} s "
+          f"({result['items_per_sec']:.0f} items/s)")
+    return result
+
+
+def bench_import_statement(rows: int, chunk_size: int = 64 * 1024) -> dict:
+    """/import-statement throughput and peak memory for a ``rows``-row CSV upload
+
+    The upload is generated while it is sent and the NDJSON answer is
+    counted and dropped, so any growth in peak RSS is the endpoint's own.
+    """
+    import asyncio
+    import resource
+
+    import main
+
+    boundary = "finvoicebenchboundary"
+    head = (f"--{boundary}\r\ncontent-disposition: form-data; name=\"file\"; filename=\"statement.csv\"\r\n"
+            "content-type: text/csv\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    def body_chunks():
+        yield head
+        buffered, size = [], 0
+        for line in _statement_lines(rows):
+            buffered.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield "".join(buffered).encode()
+                buffered, size = [], 0
+        yield "".join(buffered).encode() + tail
+
+    async def run_upload():
+        chunks = body_chunks()
+        answered = {"bytes": 0, "lines": 0, "last": b""}
+        scope = {"type": "http", "http_version": "1.1", "method": "POST", "path": "/import-statement",
+                 "raw_path": b"/import-statement", "query_string": b"", "root_path": "", "scheme": "http",
+                 "server": ("bench", 80), "client": ("bench", 1),
+                 "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]}
+
+        async def receive():
+            chunk = next(chunks, None)
+            if chunk is None:
+                return {"type": "http.request", "body": b"", "more_body": False}
+            return {"type": "http.request", "body": chunk, "more_body": True}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                body = message["body"]
+                answered["bytes"] += len(body)
+                answered["lines"] += body.count(b"\n")
+                answered["last"] = body
+        await main.app(scope, receive, send)
+        return answered
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    answered = asyncio.run(run_upload())
+    elapsed = time.perf_counter() - start
+    rss_growth_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    summary = json.loads(answered["last"].splitlines()[-1])
+    result = {"rows": rows, "transactions": summary["transactions"], "rows_per_sec": rows / elapsed,
+              "response_mb": answered["bytes"] / 2 ** 20, "peak_rss_growth_mb": rss_growth_mb}
+    print(f"/import-statement, {rows} CSV rows: {elapsed:.2f} s ({result['rows_per_sec']:.0f} rows/s), "
+          f"{result['response_mb']:.0f} MB of NDJSON, peak RSS +{rss_growth_mb:.1f} MB")
+    return result
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _hammer(port: int, duration: float) -> int:
+    """Send /categorize requests over one keep-alive connection; return the count"""
+    import http.client
+
+    body = json.dumps({"text": "add dinner at restaurant 300"})
+    headers = {"content-type": "application/json"}
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        connection.request("POST", "/categorize", body, headers)
+        response = connection.getresponse()
+        response.read()
+        done += response.status == 200
+    connection.close()
+    return done
+
+
+def bench_serve_scaling(max_workers: int, duration: float = 5.0, connections_per_worker: int = 4) -> List[dict]:
+    """/categorize throughput of serve.py with 1, 2, 4, ... up to ``max_workers`` workers
+
+    Load comes from separate client processes on the same machine, so the
+    clients need spare cores too for the scaling to show.
+    """
+    import signal
+    import urllib.request
+    from multiprocessing import Pool
+
+    counts = sorted({1, max_workers} | {2 ** i for i in range(1, max_workers.bit_length()) if 2 ** i < max_workers})
+    results = []
+    for workers in counts:
+        port = _free_port()
+        env = dict(os.environ, WORKER_ROLE="parse", RESPONSE_CACHE_SIZE="0", METRICS_ENABLED="0")
+        server = subprocess.Popen([sys.executable, os.path.join(HERE, "serve.py"), "--workers", str(workers),
+                                   "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                                  env=env, cwd=HERE)
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz") as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise
+                time.sleep(0.1)
+            connections = workers * connections_per_worker
+            with Pool(connections) as pool:
+                completed = sum(pool.starmap(_hammer, [(port, duration)] * connections))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        throughput = completed / duration
+        baseline = results[0]["requests_per_sec"] if results else throughput
+        results.append({"workers": workers, "requests_per_sec": throughput, "speedup": throughput / baseline})
+        print(f"serve.py /categorize, {workers:3d} workers: {throughput:9.1f} req/s "
+              f"(x{throughput / baseline:.2f}, {throughput / baseline / workers:.0%} of linear)")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="pattern", help="only run scenarios whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend per scenario")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update", action="store_true", help="write results as the new baselines")
+    parser.add_argument("--check", action="store_true", help="exit non-zero on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed p50 slowdown as a fraction (default 0.25)")
+    parser.add_argument("--load", action="store_true", help="also run the /categorize load test")
+    parser.add_argument("--scaling", type=int, nargs="?", const=os.cpu_count() or 1, metavar="WORKERS",
+                        help="also measure serve.py throughput scaling up to WORKERS (default: core count)")
+    parser.add_argument("--statement", type=int, nargs="?", const=1000000, metavar="ROWS",
+                        help="also measure /import-statement with a ROWS-row CSV (default: 1000000)")
+    parser.add_argument("--voice-stream", type=int, nargs="?", const=1000, metavar="CONNECTIONS",
+                        help="also measure voice WebSocket throughput with CONNECTIONS connections (default: 1000)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in SCENARIOS if not args.pattern or args.pattern in name]
+    results = run(names, args.min_time)
+
+    if args.load:
+        bench_categorize_under_prediction_load(workers=0)
+        bench_categorize_under_prediction_load(workers=os.cpu_count() or 1)
+
+    if args.scaling:
+        bench_serve_scaling(args.scaling)
+
+    if args.voice_stream:
+        bench_voice_stream(args.voice_stream)
+
+    if args.statement:
+        bench_import_statement(args.statement)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    if args.update:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines written to {args.baselines}")
+
+    failures = check(results, {} if args.update else baselines, args.threshold)
+    for failure in failures:
+        print("REGRESSION", failure)
+    return 1 if failures and (args.check or any("budget" in f for f in failures)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
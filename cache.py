@@ -0,0 +1,179 @@
+"""Bounded response cache for deterministic endpoints
+
+Entries live in an in-process LRU with a TTL. An optional SQLite file can
+back it so several uvicorn workers on the same host share hits. Keys
+include a version token supplied by the caller (category rules, historical
+data), so a rules reload or new price data makes old entries unreachable
+without an explicit flush.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Shared-store writes between sweeps of expired rows
+SWEEP_INTERVAL = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of an utterance"""
+    return " ".join(text.lower().split())
+
+
+class ResponseCache:
+    """LRU + TTL cache with hit/miss counters and an optional shared store"""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0, shared_path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._shared = None
+        self._shared_path = shared_path
+        self._inherited: List[sqlite3.Connection] = []
+        self._writes = 0
+        if shared_path and maxsize > 0:
+            self._connect_shared()
+            _shared_caches.add(self)
+
+    def _connect_shared(self):
+        self._shared = sqlite3.connect(self._shared_path, check_same_thread=False, timeout=1.0)
+        self._shared.execute("PRAGMA journal_mode=WAL")
+        self._shared.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _reconnect_after_fork(self):
+        # Same rule as the ledger: never reuse a SQLite connection across fork()
+        self._inherited.append(self._shared)
+        self._lock = threading.Lock()
+        self._connect_shared()
+
+    @property
+    def shared(self) -> bool:
+        """True when lookups also go to the shared SQLite store, which can block"""
+        return self._shared is not None
+
+    @staticmethod
+    def make_key(namespace: str, payload: Any, version: Any = None) -> str:
+        """Stable key for a request body under a given data version"""
+        raw = json.dumps([namespace, version, payload], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for a key"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[key]
+
+        if self._shared is not None:
+            value = self._shared_get(key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, value, now)
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key: str, value: Any):
+        """Insert a value, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        if self._shared is not None:
+            self._shared_set(key, value)
+
+    def _store(self, key: str, value: Any, now: float):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, namespace: str, payload: Any, version: Any, compute: Callable[[], Any]) -> Any:
+        """Return the cached response for a payload, computing it on a miss"""
+        if self.maxsize <= 0:
+            return compute()
+        key = self.make_key(namespace, payload, version)
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    # The shared store uses wall-clock expiry since monotonic clocks are per process
+    def _shared_get(self, key: str) -> Any:
+        try:
+            with self._lock:
+                row = self._shared.execute(
+                    "SELECT value FROM response_cache WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _shared_set(self, key: str, value: Any):
+        try:
+            with self._lock, self._shared:
+                self._shared.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + self.ttl))
+                self._writes += 1
+                if self._writes % SWEEP_INTERVAL == 0:
+                    self._shared.execute("DELETE FROM response_cache WHERE expires <= ?", (time.time(),))
+        except sqlite3.Error:
+            # A busy or unavailable shared store only costs us a shared hit
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._shared is not None:
+                with self._shared:
+                    self._shared.execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "shared": self._shared is not None
+            }
+
+
+# Caches with a shared store in this process, reconnected in forked workers
+_shared_caches: "weakref.WeakSet[ResponseCache]" = weakref.WeakSet()
+
+
+def _reconnect_after_fork():
+    for cache in list(_shared_caches):
+        cache._reconnect_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
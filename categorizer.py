@@ -1,55 +1,226 @@
+import json
+import logging
+import os
 import re
-from typing import Dict, List, Tuple
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utterance import parse_utterance
+
+logger = logging.getLogger(__name__)
+
+# Keyword rules shipped with the service; override with CATEGORY_RULES_PATH
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "categories.json")
+
+class KeywordMatcher:
+    """Precompiled multi-keyword matcher with first-category-wins semantics
+
+    All keywords are compiled into a single alternation wrapped in a
+    lookahead, so one scan reports every keyword occurrence (including
+    overlapping ones). Alternatives are ordered by category priority, which
+    means the keyword reported at any position is the highest-priority one
+    starting there. The result for a text is the lowest category index seen,
+    exactly matching the nested ``for category / for keyword`` loop.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], default: str = "misc"):
+        self.default = default
+        self.category_names = list(categories.keys())
+
+        # Map each keyword to the highest-priority category that lists it
+        self._keyword_rank: Dict[str, int] = {}
+        for rank, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword and keyword not in self._keyword_rank:
+                    self._keyword_rank[keyword] = rank
+
+        if self._keyword_rank:
+            alternation = "|".join(re.escape(keyword) for keyword in self._keyword_rank)
+            self._pattern = re.compile(f"(?=({alternation}))")
+        else:
+            self._pattern = None
+
+    def match(self, description: str) -> str:
+        """Return the category for a single description"""
+        if self._pattern is None:
+            return self.default
+
+        best = len(self.category_names)
+        for found in self._pattern.finditer(description.lower()):
+            rank = self._keyword_rank[found.group(1)]
+            if rank < best:
+                best = rank
+                if best == 0:
+                    break
+
+        return self.category_names[best] if best < len(self.category_names) else self.default
+
+    def match_many(self, descriptions: Iterable[str]) -> List[str]:
+        """Return categories for many descriptions, in order, using one scan"""
+        descriptions = [description.lower() for description in descriptions]
+        if self._pattern is None or not descriptions:
+            return [self.default] * len(descriptions)
+
+        # Keywords never contain newlines, so joining on "\n" cannot create
+        # matches that span two descriptions
+        joined = "\n".join(descriptions)
+        starts = []
+        offset = 0
+        for description in descriptions:
+            starts.append(offset)
+            offset += len(description) + 1
+
+        n_categories = len(self.category_names)
+        best = [n_categories] * len(descriptions)
+        index = 0
+        for found in self._pattern.finditer(joined):
+            position = found.start()
+            while index + 1 < len(starts) and starts[index + 1] <= position:
+                index += 1
+            rank = self._keyword_rank[found.group(1)]
+            if rank < best[index]:
+                best[index] = rank
+
+        return [self.category_names[rank] if rank < n_categories else self.default for rank in best]
+
+
+class CompiledRules:
+    """Immutable snapshot of the keyword rules and their compiled matcher"""
+
+    __slots__ = ("categories", "matcher", "version")
+
+    def __init__(self, categories: Dict[str, List[str]], version: int = 0):
+        self.categories = categories
+        self.matcher = KeywordMatcher(categories)
+        self.version = version
+
+
+class RuleEngine:
+    """Loads keyword rules from a JSON file and hot-reloads them on change
+
+    The rules file maps category names to keyword lists, in priority order.
+    Callers grab the current ``CompiledRules`` snapshot and use it for the
+    whole request, so a reload never changes rules halfway through one. A
+    reload compiles the new snapshot first and then swaps a single reference;
+    requests arriving meanwhile keep using the previous snapshot instead of
+    waiting on the compile.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 1.0):
+        self.path = path or os.getenv("CATEGORY_RULES_PATH", DEFAULT_RULES_PATH)
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._compiled = self._load()
+
+    def _load(self) -> CompiledRules:
+        """Read and compile the rules file"""
+        version = os.stat(self.path).st_mtime_ns
+        with open(self.path, encoding="utf-8") as f:
+            categories = json.load(f)
+        if not isinstance(categories, dict) or not all(isinstance(v, list) for v in categories.values()):
+            raise ValueError(f"{self.path} must map category names to keyword lists")
+        # match_many joins descriptions with newlines, so keywords must not span one
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                if not isinstance(keyword, str) or not keyword.strip() or "\n" in keyword:
+                    raise ValueError(f"{self.path}: invalid keyword {keyword!r} in category {category!r}")
+        return CompiledRules(categories, version)
+
+    def current(self) -> CompiledRules:
+        """Return the active rules, reloading first if the file has changed"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.reload()
+        return self._compiled
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile the rules if the file changed; return True on swap"""
+        # Only one thread compiles; everyone else keeps the old snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            try:
+                version = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                logger.warning("Cannot stat category rules %s: %s", self.path, e)
+                return False
+            if not force and version == self._compiled.version:
+                return False
+            try:
+                compiled = self._load()
+            except (OSError, ValueError) as e:
+                logger.warning("Keeping previous category rules, failed to load %s: %s", self.path, e)
+                return False
+            self._compiled = compiled
+            logger.info("Loaded category rules from %s", self.path)
+            return True
+        finally:
+            self._reload_lock.release()
+
 
 class ExpenseCategorizer:
-    """Simple rule-based expense categorizer"""
+    """Expense categorizer backed by a hot-reloadable rule engine
+
+    When a trained model is configured (``model_path`` or
+    CATEGORY_MODEL_PATH, see category_model.py) it categorizes first and
+    the keyword rules only handle descriptions it is not confident about.
+    """
     
-    def __init__(self):
-        # Define category keywords
-        self.categories = {
-            "food": ["grocery", "restaurant", "dinner", "lunch", "breakfast", "food", "meal", "snack", "coffee", "pizza", "burger"],
-            "travel": ["uber", "lyft", "taxi", "flight", "hotel", "airbnb", "car rental", "gas", "fuel", "train", "bus", "travel"],
-            "bills": ["rent", "electricity", "water", "internet", "phone", "utility", "insurance", "bill", "subscription"],
-            "entertainment": ["movie", "netflix", "spotify", "concert", "game", "entertainment", "music", "show", "theater", "streaming"],
-            "shopping": ["amazon", "clothing", "shoes", "electronics", "furniture", "shopping", "store", "mall", "online"],
-            "health": ["doctor", "medicine", "pharmacy", "hospital", "clinic", "health", "medical", "fitness", "gym"],
-            "education": ["book", "course", "tuition", "school", "college", "university", "education", "learning"],
-            "misc": []
-        }
+    def __init__(self, rules_path: Optional[str] = None, model_path: Optional[str] = None,
+                 min_confidence: Optional[float] = None):
+        self.engine = RuleEngine(rules_path)
+        self.model = None
+        model_path = model_path or os.getenv("CATEGORY_MODEL_PATH")
+        if model_path:
+            # Imported here so rule-only deployments never load NumPy for it
+            from category_model import DEFAULT_MIN_CONFIDENCE, LazyCategoryModel
+            if min_confidence is None:
+                min_confidence = float(os.getenv("CATEGORY_MODEL_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))
+            self.model = LazyCategoryModel(model_path, min_confidence)
+    
+    @property
+    def categories(self) -> Dict[str, List[str]]:
+        """Keyword rules currently in effect"""
+        return self.engine.current().categories
+    
+    @property
+    def version(self) -> Tuple[int, int]:
+        """Versions of the current rules and model; changes on every reload"""
+        return self.engine.current().version, self.model.version if self.model is not None else 0
+    
+    @property
+    def matcher(self) -> KeywordMatcher:
+        """Compiled matcher for the current rules"""
+        return self.engine.current().matcher
     
     def categorize(self, description: str) -> str:
         """Categorize an expense based on its description"""
-        description = description.lower()
-        
-        # Check each category's keywords
-        for category, keywords in self.categories.items():
-            for keyword in keywords:
-                if keyword in description:
-                    return category
+        if self.model is not None:
+            return self.categorize_many([description])[0]
+        return self.matcher.match(description)
+    
+    def categorize_many(self, descriptions: Iterable[str]) -> List[str]:
+        """Categorize many expense descriptions in a single pass"""
+        if self.model is None:
+            return self.matcher.match_many(descriptions)
         
-        # Default to misc if no match found
-        return "misc"
+        descriptions = list(descriptions)
+        predicted = self.model.predict(descriptions)
+        unsure = [i for i, category in enumerate(predicted) if category is None]
+        if unsure:
+            fallback = self.matcher.match_many([descriptions[i] for i in unsure])
+            for i, category in zip(unsure, fallback):
+                predicted[i] = category
+        return predicted
     
-    def parse_voice_input(self, text: str) -> Tuple[str, float, str]:
+    def parse_voice_input(self, text: str) -> Tuple[str, Optional[float], str]:
         """Parse voice input to extract expense details"""
-        text = text.lower()
-        
-        # Extract amount using regex
-        amount_match = re.search(r'\b(\d+(?:\.\d+)?)\b', text)
-        amount = float(amount_match.group(1)) if amount_match else None
-        
-        # Extract description
-        # Remove "add" and amount from text to get description
-        description = text
-        if "add" in description:
-            description = description.replace("add", "", 1).strip()
-        if amount_match:
-            description = description.replace(amount_match.group(1), "", 1).strip()
-        
-        # Categorize the expense
-        category = self.categorize(description)
-        
-        return description, amount, category
+        utterance = parse_utterance(text, self.categorize)
+        return utterance.description, utterance.amount, utterance.category
     
     def get_all_categories(self) -> List[str]:
         """Return all available categories"""
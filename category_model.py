@@ -0,0 +1,310 @@
+"""Learned expense categorizer: hashed character n-grams + linear classifier
+
+Each description is padded with spaces, encoded as UTF-8 and cut into
+character n-grams, which are hashed into a fixed number of buckets. A
+description's feature vector is the mean of its buckets' weight rows, so
+scoring a batch is one gather from the weight matrix followed by a per-row
+sum (a sparse matrix multiply), all in NumPy. Hashing runs over one
+concatenated byte buffer for the whole batch.
+
+Models are trained offline from a labelled CSV and saved as an
+uncompressed ``.npz``. Loading memory-maps the weight matrix straight out
+of the archive, so startup costs a few stat/open calls and only the rows a
+request touches are paged in.
+
+    python category_model.py train expenses.csv -o category_model.npz
+    python category_model.py predict category_model.npz "uber to airport"
+"""
+import argparse
+import csv
+import logging
+import os
+import threading
+import time
+import zipfile
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = 1 << 18
+DEFAULT_NGRAMS = (2, 3, 4)
+
+# Below this probability the caller should fall back to the keyword rules
+DEFAULT_MIN_CONFIDENCE = 0.5
+
+_HASH_MULTIPLIER = np.uint64(0x100000001B3)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_ngrams(texts: Sequence[str], buckets: int, ngrams: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (features, counts): every text's n-gram buckets, back to back
+
+    ``features`` holds the bucket of every character n-gram, ordered by
+    text, and ``counts`` how many of them belong to each text. Texts are
+    lowercased and padded so word boundaries become features; NUL bytes,
+    which separate the texts in the batch, are read as spaces. Hashes are
+    computed over the whole batch at once with a rolling multiply-add
+    across the concatenated bytes, extended one byte at a time from the
+    shortest n-gram length to the longest, and n-grams spanning two texts
+    are dropped. ``buckets`` must be a power of two.
+    """
+    shift = np.uint64(64 - (buckets.bit_length() - 1))
+    encoded = b"\x00".join(b" " + " ".join(text.lower().replace("\x00", " ").split()).encode() + b" "
+                           for text in texts)
+    data = np.frombuffer(encoded, dtype=np.uint8)
+    row_of = np.cumsum(data == 0, dtype=np.int64)
+
+    # One column per n-gram length, one row per start position, so flattening
+    # in C order keeps the n-grams sorted by text
+    hashes = np.zeros((len(data), len(ngrams)), dtype=np.uint64)
+    valid = np.zeros((len(data), len(ngrams)), dtype=bool)
+    h = np.zeros(len(data), dtype=np.uint64)
+    length = 0
+    with np.errstate(over="ignore"):
+        for column, n in enumerate(sorted(ngrams)):
+            count = len(data) - n + 1
+            if count <= 0:
+                break
+            while length < n:
+                h = h[:len(data) - length] * _HASH_MULTIPLIER + data[length:]
+                length += 1
+            # Multiplicative hashing: the top bits of the mixed value pick the bucket
+            hashes[:count, column] = ((h[:count] + np.uint64(n)) * _HASH_MIX) >> shift
+            # The separator only ever sits at the first byte of a text's
+            # segment, so equal row ids at both ends mean no separator inside
+            valid[:count, column] = (row_of[:count] == row_of[n - 1:]) & (data[:count] != 0)
+
+    counts = np.bincount(row_of, weights=valid.sum(axis=1), minlength=len(texts)).astype(np.int64)
+    return hashes[valid].astype(np.int64), counts
+
+
+def _mmap_npz_member(path: str, name: str) -> np.ndarray:
+    """Memory-map an array stored uncompressed inside an .npz archive"""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"{name} in {path} is compressed and cannot be memory-mapped")
+    with open(path, "rb") as f:
+        # Local file header: 30 fixed bytes, then the name and extra field
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+        f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+class CategoryModel:
+    """Linear classifier over hashed character n-grams"""
+
+    def __init__(self, classes: Sequence[str], weights: np.ndarray, bias: np.ndarray,
+                 ngrams: Sequence[int] = DEFAULT_NGRAMS):
+        self.classes = list(classes)
+        self.weights = weights  # (buckets, classes)
+        self.bias = bias
+        self.ngrams = tuple(int(n) for n in ngrams)
+
+    @property
+    def buckets(self) -> int:
+        return self.weights.shape[0]
+
+    def scores(self, texts: Sequence[str]) -> np.ndarray:
+        """Logits for a batch of texts, shape (len(texts), classes)"""
+        features, counts = hash_ngrams(texts, self.buckets, self.ngrams)
+        totals = np.zeros((len(texts), len(self.classes)), dtype=np.float32)
+        if len(features):
+            # Sparse matrix multiply: gather each n-gram's weight row, then sum
+            # the contiguous run of rows belonging to each text
+            gathered = np.take(self.weights, features, axis=0)
+            starts = np.minimum(np.cumsum(counts) - counts, len(features) - 1)
+            totals = np.add.reduceat(gathered, starts, axis=0, dtype=np.float32)
+            totals[counts == 0] = 0
+        return totals / np.maximum(counts, 1)[:, None] + self.bias
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        logits = self.scores(texts)
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def predict(self, texts: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Return the most likely class and its probability for every text"""
+        if not texts:
+            return [], np.zeros(0, dtype=np.float32)
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [self.classes[i] for i in best], proba[np.arange(len(texts)), best]
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], buckets: int = DEFAULT_BUCKETS,
+              ngrams: Sequence[int] = DEFAULT_NGRAMS, epochs: int = 20, learning_rate: float = 0.5,
+              batch_size: int = 64, seed: int = 0) -> "CategoryModel":
+        """Fit softmax regression with mini-batch Adagrad
+
+        Adagrad gives every bucket its own step size, so rare n-grams still
+        learn quickly while the bias and common n-grams settle.
+        """
+        classes = sorted(set(labels))
+        class_index = {name: i for i, name in enumerate(classes)}
+        y = np.array([class_index[label] for label in labels], dtype=np.int64)
+        texts = list(texts)
+
+        if buckets & (buckets - 1):
+            raise ValueError(f"buckets must be a power of two, got {buckets}")
+
+        # Featurize once; per batch, the n-grams of its rows are sliced out
+        features, counts = hash_ngrams(texts, buckets, ngrams)
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        weights = np.zeros((buckets, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        weight_sq = np.zeros_like(weights)
+        bias_sq = np.zeros_like(bias)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            for batch in np.array_split(rng.permutation(len(texts)), max(1, len(texts) // batch_size)):
+                positions = np.concatenate([np.arange(bounds[i], bounds[i + 1]) for i in batch])
+                local = np.repeat(np.arange(len(batch)), counts[batch])
+                touched, inverse = np.unique(features[positions], return_inverse=True)
+                scale = 1.0 / np.maximum(counts[batch], 1)
+
+                logits = np.zeros((len(batch), len(classes)), dtype=np.float32)
+                np.add.at(logits, local, weights[touched][inverse])
+                logits = logits * scale[:, None] + bias
+                logits -= logits.max(axis=1, keepdims=True)
+                proba = np.exp(logits)
+                proba /= proba.sum(axis=1, keepdims=True)
+                proba[np.arange(len(batch)), y[batch]] -= 1.0  # d loss / d logits
+                proba /= len(batch)
+
+                weight_grad = np.zeros((len(touched), len(classes)), dtype=np.float32)
+                np.add.at(weight_grad, inverse, (proba * scale[:, None])[local])
+                weight_sq[touched] += weight_grad ** 2
+                weights[touched] -= learning_rate * weight_grad / (np.sqrt(weight_sq[touched]) + 1e-8)
+                bias_grad = proba.sum(axis=0)
+                bias_sq += bias_grad ** 2
+                bias -= learning_rate * bias_grad / (np.sqrt(bias_sq) + 1e-8)
+
+        return cls(classes, weights, bias, ngrams)
+
+    def save(self, path: str):
+        """Write an uncompressed .npz that ``load`` can memory-map"""
+        with open(path, "wb") as f:
+            np.savez(f, weights=self.weights.astype(np.float16), bias=self.bias.astype(np.float32),
+                     classes=np.array(self.classes), ngrams=np.array(self.ngrams, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str) -> "CategoryModel":
+        """Open a saved model with its weight matrix memory-mapped"""
+        with np.load(path, allow_pickle=False) as archive:
+            classes = archive["classes"].tolist()
+            bias = archive["bias"]
+            ngrams = archive["ngrams"].tolist()
+        return cls(classes, _mmap_npz_member(path, "weights"), bias, ngrams)
+
+
+class LazyCategoryModel:
+    """Loads a saved model on first use and reloads it when the file changes
+
+    Like the keyword RuleEngine, the file is checked at most once per
+    ``check_interval`` seconds and a model that fails to load leaves the
+    previous one in place.
+    """
+
+    def __init__(self, path: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE, check_interval: float = 1.0):
+        self.path = path
+        self.min_confidence = min_confidence
+        self.check_interval = check_interval
+        self._model: Optional[CategoryModel] = None
+        self._version = 0
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Modification time of the loaded model file"""
+        self.current()
+        return self._version
+
+    def current(self) -> CategoryModel:
+        now = time.monotonic()
+        if self._model is None or now >= self._next_check:
+            with self._lock:
+                if self._model is None or now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    self._reload()
+        return self._model
+
+    def _reload(self):
+        try:
+            version = os.stat(self.path).st_mtime_ns
+            if self._model is not None and version == self._version:
+                return
+            model = CategoryModel.load(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            if self._model is None:
+                raise
+            logger.warning("Keeping previous category model, failed to load %s: %s", self.path, e)
+            return
+        self._model, self._version = model, version
+        logger.info("Loaded category model from %s", self.path)
+
+    def predict(self, texts: Sequence[str]) -> List[Optional[str]]:
+        """Predicted class per text, or None where the model is not confident"""
+        labels, confidence = self.current().predict(texts)
+        return [label if p >= self.min_confidence else None for label, p in zip(labels, confidence.tolist())]
+
+
+def read_labelled_csv(path: str, text_column: str = "description",
+                      label_column: str = "category") -> Tuple[List[str], List[str]]:
+    """Read (texts, labels) from a CSV with a header row"""
+    texts, labels = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get(text_column) and row.get(label_column):
+                texts.append(row[text_column])
+                labels.append(row[label_column].strip().lower())
+    return texts, labels
+
+
+def _accuracy(model: CategoryModel, texts: Sequence[str], labels: Sequence[str]) -> float:
+    predicted, _ = model.predict(texts)
+    return float(np.mean([p == label for p, label in zip(predicted, labels)])) if labels else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train or query the learned expense categorizer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="train a model from a labelled CSV")
+    train.add_argument("csv")
+    train.add_argument("-o", "--output", default="category_model.npz")
+    train.add_argument("--text-column", default="description")
+    train.add_argument("--label-column", default="category")
+    train.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS)
+    train.add_argument("--epochs", type=int, default=30)
+    train.add_argument("--learning-rate", type=float, default=1.0)
+    predict = commands.add_parser("predict", help="categorize descriptions with a saved model")
+    predict.add_argument("model")
+    predict.add_argument("texts", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        texts, labels = read_labelled_csv(args.csv, args.text_column, args.label_column)
+        model = CategoryModel.train(texts, labels, buckets=args.buckets, epochs=args.epochs,
+                                    learning_rate=args.learning_rate)
+        model.save(args.output)
+        print(f"trained on {len(texts)} rows, {len(model.classes)} classes, "
+              f"training accuracy {_accuracy(model, texts, labels):.3f}; saved to {args.output}")
+    else:
+        model = CategoryModel.load(args.model)
+        labels, confidence = model.predict(args.texts)
+        for text, label, p in zip(args.texts, labels, confidence.tolist()):
+            print(f"{text} -> {label} ({p:.2f})")
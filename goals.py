@@ -0,0 +1,187 @@
+"""Savings goal projections
+
+For every goal (target amount, amount already saved, deadline, where the
+money is kept) this works out the level monthly deposit that reaches the
+target by the deadline, which category cuts would free that money up, and
+when each goal completes under a set of what-if scenarios. Deposits and
+completion times use the closed-form annuity formulas, broadcast over a
+scenarios x goals grid, so the cost is a handful of array operations no
+matter how many goals and scenarios a request carries.
+"""
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Annual return assumed for goals kept in a savings account
+SAVINGS_ANNUAL_RETURN = float(os.getenv("SAVINGS_ANNUAL_RETURN", "0.04"))
+
+# Largest share of a category's monthly spending proposed as a cut
+MAX_CATEGORY_CUT = 0.3
+
+# Categories never proposed for cuts
+ESSENTIAL_CATEGORIES = frozenset({"bills", "health"})
+
+# Goals further out than this many months are reported as unreachable
+MAX_MONTHS = 1200
+
+
+def monthly_rate(annual_return):
+    """Monthly rate compounding to the given annual return"""
+    return np.power(1.0 + np.asarray(annual_return, dtype=float), 1.0 / 12) - 1.0
+
+
+def months_between(start: date, end: date) -> int:
+    """Whole months from ``start`` until ``end``, never negative"""
+    months = (end.year - start.year) * 12 + end.month - start.month - (end.day < start.day)
+    return max(months, 0)
+
+
+def required_deposit(target, saved, months, rate) -> np.ndarray:
+    """Level monthly deposit growing ``saved`` to ``target`` in ``months`` (broadcasts)
+
+    Solves target = saved * g + deposit * (g - 1) / rate with g = (1 + rate) ** months.
+    A deadline that has already passed needs the whole shortfall now.
+    """
+    target, saved, months, rate = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (target, saved, months, rate)))
+    growth = np.power(1.0 + rate, months)
+    shortfall = target - saved * growth
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(np.abs(rate) > 1e-12, (growth - 1.0) / rate, months)
+        deposit = np.where(months > 0, shortfall / annuity, shortfall)
+    return np.maximum(deposit, 0.0)
+
+
+def months_to_target(target, saved, deposit, rate) -> np.ndarray:
+    """Whole months until ``saved`` plus monthly deposits reach ``target`` (broadcasts)
+
+    Inverts the annuity formula: (1 + rate) ** n = (target * rate + deposit) /
+    (saved * rate + deposit). Goals that never get there are ``inf``.
+    """
+    target, saved, deposit, rate = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (target, saved, deposit, rate)))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        compounding = np.log((target * rate + deposit) / (saved * rate + deposit)) / np.log1p(rate)
+        linear = (target - saved) / deposit
+        months = np.where(np.abs(rate) > 1e-12, compounding, linear)
+    months = np.where(saved >= target, 0.0, months)
+    reachable = np.isfinite(months) & (months >= 0) & (months <= MAX_MONTHS)
+    return np.where(reachable, np.ceil(months - 1e-6), np.inf)
+
+
+def category_cuts(spending: Dict[str, float], gap: float) -> Tuple[List[Dict], float]:
+    """Smallest set of category cuts, largest first, covering ``gap`` a month
+
+    Each non-essential category can give up to MAX_CATEGORY_CUT of its
+    spending. Returns the cuts and whatever part of the gap they cannot cover.
+    """
+    names = [name for name in spending if name not in ESSENTIAL_CATEGORIES]
+    if gap <= 0 or not names:
+        return [], max(gap, 0.0)
+    available = np.asarray([spending[name] for name in names], dtype=float) * MAX_CATEGORY_CUT
+    order = np.argsort(-available, kind="stable")
+    covered = np.cumsum(available[order])
+    # First position where the running total covers the gap
+    needed = int(np.searchsorted(covered, gap))
+    cuts = available[order][:needed + 1].copy()
+    if needed < len(covered):
+        cuts[-1] = gap - (covered[needed - 1] if needed else 0.0)
+    shortfall = max(gap - float(cuts.sum()), 0.0)
+    return [
+        {"category": names[slot], "cut": round(cut, 2), "new_budget": round(spending[names[slot]] - cut, 2)}
+        for slot, cut in zip(order[:len(cuts)].tolist(), cuts.tolist()) if cut > 0
+    ], round(shortfall, 2)
+
+
+def project_goals(goals: List[Dict], monthly_spending: Dict[str, float], monthly_savings: float,
+                  annual_returns: Dict[str, float], scenarios: Optional[List[Dict]] = None,
+                  today: Optional[date] = None) -> Dict:
+    """Required deposits, category cuts and completion dates for a set of goals
+
+    ``goals`` have a ``target_amount`` and optionally ``saved``, ``deadline``
+    (a date) and ``investment_type`` (a key of ``annual_returns``). Savings
+    cover the required deposits first, the rest goes to goals without a
+    deadline.
+    ``scenarios`` may set ``monthly_savings`` outright, add ``extra_savings``,
+    redirect a ``spending_cut`` share of non-essential spending to savings
+    and shift every return by ``return_shift``; the current situation is
+    always the first scenario.
+    """
+    today = today or date.today()
+    scenarios = [{"name": "current"}] + list(scenarios or [])
+
+    target = np.asarray([goal["target_amount"] for goal in goals], dtype=float)
+    saved = np.asarray([goal.get("saved") or 0.0 for goal in goals], dtype=float)
+    months_left = np.asarray([months_between(today, goal["deadline"]) if goal.get("deadline") else np.nan
+                              for goal in goals], dtype=float)
+    annual = np.asarray([annual_returns[goal.get("investment_type") or "savings"] for goal in goals], dtype=float)
+
+    required = required_deposit(target, saved, months_left, monthly_rate(annual))
+    required = np.where(np.isnan(months_left), 0.0, required)
+    total_required = float(required.sum())
+    gap = max(total_required - monthly_savings, 0.0)
+    cuts, shortfall = category_cuts(monthly_spending, gap)
+
+    # Scenario parameters as columns, broadcast against the goals as rows
+    override = np.asarray([s.get("monthly_savings") if s.get("monthly_savings") is not None else np.nan
+                           for s in scenarios], dtype=float)
+    extra = np.asarray([s.get("extra_savings") or 0.0 for s in scenarios], dtype=float)
+    spending_cut = np.asarray([s.get("spending_cut") or 0.0 for s in scenarios], dtype=float)
+    return_shift = np.asarray([s.get("return_shift") or 0.0 for s in scenarios], dtype=float)
+    cuttable = sum(amount for name, amount in monthly_spending.items() if name not in ESSENTIAL_CATEGORIES)
+
+    savings = np.maximum(np.where(np.isnan(override), monthly_savings, override) + extra + spending_cut * cuttable, 0.0)
+    # Goals with deadlines get their required deposits first (pro rata when
+    # savings fall short); what is left goes to the open-ended goals, or
+    # back to the deadline goals when every goal has one
+    open_ended = np.isnan(months_left)
+    deadline_weights = required / total_required if total_required > 0 else np.zeros(len(goals))
+    if open_ended.any():
+        leftover_weights = open_ended / open_ended.sum()
+    elif total_required > 0:
+        leftover_weights = deadline_weights
+    else:
+        leftover_weights = np.full(len(goals), 1.0 / len(goals))
+    funded = np.minimum(savings, total_required)
+    deposits = funded[:, None] * deadline_weights[None, :] + (savings - funded)[:, None] * leftover_weights[None, :]
+    rates = monthly_rate(annual[None, :] + return_shift[:, None])
+    months = months_to_target(target[None, :], saved[None, :], deposits, rates)
+
+    reachable = np.isfinite(months)
+    completion_months = np.datetime64(today, "M") + np.where(reachable, months, 0).astype(np.int64)
+    completion = np.where(reachable, np.datetime_as_string(completion_months), None)
+    on_track = reachable & (np.isnan(months_left) | (months <= months_left))
+
+    return {
+        "monthly_savings": round(monthly_savings, 2),
+        "required_monthly_savings": round(total_required, 2),
+        "gap": round(gap, 2),
+        "cuts": cuts,
+        "shortfall": shortfall,
+        "goals": [
+            {
+                "name": goal.get("name") or "savings",
+                "target_amount": goal["target_amount"],
+                "saved": goal.get("saved") or 0.0,
+                "deadline": goal["deadline"].isoformat() if goal.get("deadline") else None,
+                "expected_return": round(expected, 4),
+                "required_monthly_savings": round(deposit, 2) if goal.get("deadline") else None,
+                "monthly_contribution": round(contribution, 2),
+                "projected_completion": done,
+                "on_track": bool(track),
+            }
+            for goal, expected, deposit, contribution, done, track in zip(
+                goals, annual.tolist(), required.tolist(), deposits[0].tolist(), completion[0].tolist(),
+                on_track[0].tolist())
+        ],
+        "scenarios": [
+            {
+                "name": scenario.get("name") or f"scenario {index}",
+                "monthly_savings": round(amount, 2),
+                "projected_completion": done,
+                "goals_on_track": count,
+            }
+            for index, (scenario, amount, done, count) in enumerate(zip(
+                scenarios, savings.tolist(), completion.tolist(), on_track.sum(axis=1).tolist()))
+        ],
+    }
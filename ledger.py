@@ -0,0 +1,203 @@
+"""Per-user expense ledger with incrementally maintained rollups
+
+Expenses are appended to a local SQLite database. Every append also
+updates per-category, per-day, per-month and per-user running totals in
+the same transaction, so summaries are read from precomputed rows instead
+of re-aggregating the expense history.
+"""
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    description TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    spent_on TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS expenses_by_user ON expenses (user_id, spent_on);
+
+CREATE TABLE IF NOT EXISTS category_rollups (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    UNIQUE (user_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, month, category)
+);
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (user_id, day, category)
+);
+
+CREATE TABLE IF NOT EXISTS user_totals (
+    user_id TEXT PRIMARY KEY,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+
+def _spent_on(value: Union[date, str, None]) -> str:
+    """The ISO day an expense was made on, today when missing"""
+    if not value:
+        return date.today().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()[:10]
+    try:
+        return date.fromisoformat(value[:10]).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid expense date {value!r}, expected YYYY-MM-DD") from None
+
+
+class ExpenseLedger:
+    """SQLite-backed expense ledger shared by all requests in a process"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LEDGER_DB_PATH", "ledger.db")
+        self._lock = threading.Lock()
+        self._inherited: List[sqlite3.Connection] = []
+        self._connect()
+        _open_ledgers.add(self)
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            # Databases created before daily_rollups existed get it filled once
+            if self._conn.execute("SELECT 1 FROM daily_rollups LIMIT 1").fetchone() is None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO daily_rollups (user_id, day, category, total) "
+                    "SELECT user_id, spent_on, category, SUM(amount) FROM expenses "
+                    "GROUP BY user_id, spent_on, category ORDER BY MIN(id)")
+
+    def _reconnect_after_fork(self):
+        # A SQLite connection must not be used across fork(). The inherited
+        # one stays referenced so garbage collection never closes it from
+        # the child, and the child gets a fresh connection and lock.
+        self._inherited.append(self._conn)
+        self._lock = threading.Lock()
+        self._connect()
+
+    def append(self, user_id: str, expenses: Iterable[Dict]) -> List[Dict]:
+        """Store expenses and fold them into the user's rollups
+
+        Raises ValueError for a date that is not an ISO date.
+        """
+        rows = []
+        for expense in expenses:
+            rows.append((user_id, expense["description"], float(expense["amount"]),
+                         expense.get("category") or "misc", _spent_on(expense.get("date"))))
+        if not rows:
+            return []
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO expenses (user_id, description, amount, category, spent_on) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            self._conn.executemany(
+                "INSERT INTO category_rollups (user_id, category, total, count) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (user_id, category) DO UPDATE SET "
+                "total = total + excluded.total, count = count + 1",
+                [(user_id, category, amount) for _, _, amount, category, _ in rows])
+            self._conn.executemany(
+                "INSERT INTO monthly_rollups (user_id, month, category, total, count) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT (user_id, month, category) DO UPDATE SET "
+                "total = total + excluded.total, count = count + 1",
+                [(user_id, spent_on[:7], category, amount) for _, _, amount, category, spent_on in rows])
+            self._conn.executemany(
+                "INSERT INTO daily_rollups (user_id, day, category, total) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, day, category) DO UPDATE SET total = total + excluded.total",
+                [(user_id, spent_on, category, amount) for _, _, amount, category, spent_on in rows])
+            self._conn.execute(
+                "INSERT INTO user_totals (user_id, total, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET "
+                "total = total + excluded.total, count = count + excluded.count",
+                (user_id, sum(row[2] for row in rows), len(rows)))
+
+        return [
+            {"description": description, "amount": amount, "category": category, "date": spent_on}
+            for _, description, amount, category, spent_on in rows
+        ]
+
+    def category_totals(self, user_id: str) -> Dict[str, float]:
+        """Spending per category, in the order categories were first used"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, total FROM category_rollups WHERE user_id = ? ORDER BY rowid",
+                (user_id,)).fetchall()
+        return dict(rows)
+
+    def daily_totals(self, user_id: str) -> Tuple[List[str], List[str], List[float]]:
+        """Category, day and total columns from the per-day rollups
+
+        Rows come in the order categories were first used, like ``category_totals``.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, day, total FROM daily_rollups WHERE user_id = ? ORDER BY rowid",
+                (user_id,)).fetchall()
+        if not rows:
+            return [], [], []
+        categories, days, totals = zip(*rows)
+        return list(categories), list(days), list(totals)
+
+    def summary(self, user_id: str) -> Dict:
+        """Running totals for a user, per category and per month"""
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT total, count FROM user_totals WHERE user_id = ?", (user_id,)).fetchone()
+            categories = self._conn.execute(
+                "SELECT category, total, count FROM category_rollups WHERE user_id = ? ORDER BY rowid",
+                (user_id,)).fetchall()
+            months = self._conn.execute(
+                "SELECT month, category, total FROM monthly_rollups WHERE user_id = ? ORDER BY month",
+                (user_id,)).fetchall()
+
+        monthly: Dict[str, Dict[str, float]] = {}
+        for month, category, total in months:
+            monthly.setdefault(month, {})[category] = total
+        return {
+            "user_id": user_id,
+            "total": totals[0] if totals else 0.0,
+            "count": totals[1] if totals else 0,
+            "categories": [{"category": c, "total": t, "count": n} for c, t, n in categories],
+            "months": monthly
+        }
+
+    def close(self):
+        _open_ledgers.discard(self)
+        self._conn.close()
+
+
+# Ledgers open in this process, reconnected in forked worker processes
+_open_ledgers: "weakref.WeakSet[ExpenseLedger]" = weakref.WeakSet()
+
+
+def _reconnect_after_fork():
+    for ledger in list(_open_ledgers):
+        ledger._reconnect_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
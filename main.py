@@ -1,21 +1,62 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import APIRouter, FastAPI, HTTPException, Body, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, model_validator
+from typing import TYPE_CHECKING, List, Literal, Optional, Dict
+from typing_extensions import TypedDict
+import datetime
 import os
-import json
-from dotenv import load_dotenv
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
 import random
+import tempfile
+import threading
+from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+
+# Only modules that every worker needs are imported here. NumPy, the
+# predictor and the offload pool are imported on first use (or by warm_up),
+# so a parse-only worker starts without the prediction stack.
+from categorizer import ExpenseCategorizer
+from codec import FastJSONResponse, LineSplitter, dumps, loads
+from utterance import UtteranceSplitter, parse_utterance
+from ledger import ExpenseLedger
+from statement import MultipartFileReader, StatementError, StatementImport, StatementReader
+from cache import ResponseCache, normalize_text
+from metrics import MetricsMiddleware, registry as metrics_registry, stage
+
+if TYPE_CHECKING:
+    import numpy as np
+    from offload import PredictionOffloader
+    from predictor import InvestmentPredictor
+    from spending import CategoryAggregator
 
 # Load environment variables
 load_dotenv()
 
+# Which endpoints this worker serves: "parse" (categorizing, voice input,
+# ledger and advice), "predict" (investment predictions) or "all"
+WORKER_ROLES = ("all", "parse", "predict")
+WORKER_ROLE = os.getenv("WORKER_ROLE", "all").lower()
+if WORKER_ROLE not in WORKER_ROLES:
+    raise ValueError(f"WORKER_ROLE must be one of {', '.join(WORKER_ROLES)}, got {WORKER_ROLE!r}")
+
+def _serves(role: str) -> bool:
+    return WORKER_ROLE in ("all", role)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ready
+    # WARM_UP=0 defers every heavy import and precomputation to first use
+    if os.getenv("WARM_UP", "1").lower() not in ("0", "false", "no", "off"):
+        warm_up()
+    else:
+        ready = True
+    yield
+    if offloader is not None:
+        offloader.shutdown(wait=True)
+
 # Initialize FastAPI app
-app = FastAPI(title="FinVoice ML Service")
+app = FastAPI(title="FinVoice ML Service", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,323 +67,824 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency and payload size histograms, exported on /metrics
+app.add_middleware(MetricsMiddleware)
+
+parse_router = APIRouter()
+predict_router = APIRouter()
+
+# Streamed answers are spooled in memory up to this size, then on disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+SPOOL_READ_SIZE = 64 * 1024
+
+def _spooled_response(spool) -> StreamingResponse:
+    """Send an NDJSON answer spooled while the request body was read
+    
+    Answering while the upload is still arriving would deadlock clients
+    that send the whole body before reading (requests, sync httpx), so
+    streamed uploads are read in full first.
+    """
+    def body():
+        try:
+            spool.seek(0)
+            while True:
+                chunk = spool.read(SPOOL_READ_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            spool.close()
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def _spooled(fill) -> StreamingResponse:
+    """Run ``fill(spool)`` until the request body has been read, then send the spool"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        await fill(spool)
+    except BaseException:
+        spool.close()
+        raise
+    return _spooled_response(spool)
+
 # Define models
 class ExpenseText(BaseModel):
     text: str
 
+class BatchExpenseText(BaseModel):
+    texts: List[str]
+
 class Expense(BaseModel):
     description: str
     amount: float
     category: Optional[str] = None
+    date: Optional[datetime.date] = None  # defaults to today in the ledger
+
+class LedgerAppend(BaseModel):
+    expenses: List[Expense]
+
+class ExpenseRecord(TypedDict, total=False):
+    """One row of an advice request; validated as a plain dict, unknown keys are dropped"""
+    category: Optional[str]
+    amount: Optional[float]
+    description: Optional[str]
+    date: Optional[str]
+
+class Goal(BaseModel):
+    name: str = "savings"
+    target_amount: Optional[float] = Field(None, gt=0)  # goals without one only name the advice
+    saved: float = Field(0, ge=0)
+    deadline: Optional[datetime.date] = None  # open-ended goals get whatever savings are left
+    investment_type: Literal["savings", "stocks", "gold"] = "savings"
+
+class GoalScenario(BaseModel):
+    """A what-if for the goal plan; unset fields keep the current situation"""
+    name: Optional[str] = None
+    monthly_savings: Optional[float] = Field(None, ge=0)
+    extra_savings: float = 0
+    spending_cut: float = Field(0, ge=0, le=1)  # share of non-essential spending redirected to savings
+    return_shift: float = Field(0, ge=-0.5, le=0.5)  # added to every annual return
+
+# Most what-if scenarios one advice request may carry
+MAX_GOAL_SCENARIOS = 1000
 
 class FinancialData(BaseModel):
-    expenses: List[Dict]
-    goals: Optional[List[Dict]] = None
+    """Expenses as a list of rows, as parallel columns, or both
+    
+    The columnar form {"amounts": [...], "categories": [...]} skips the
+    per-row dicts entirely and validates about 15x faster at 100k rows.
+    """
+    expenses: List[ExpenseRecord] = []
+    amounts: Optional[List[float]] = None
+    categories: Optional[List[str]] = None
+    dates: Optional[List[Optional[str]]] = None  # ISO dates, parallel to amounts
+    goals: Optional[List[Goal]] = None
+    scenarios: List[GoalScenario] = Field([], max_length=MAX_GOAL_SCENARIOS)
+    monthly_income: Optional[float] = Field(None, ge=0)
+    monthly_savings: Optional[float] = Field(None, ge=0)  # defaults to income minus spending
+    
+    @model_validator(mode="after")
+    def _check_columns(self):
+        if (self.amounts is None) != (self.categories is None):
+            raise ValueError("amounts and categories must be given together")
+        if self.amounts is not None and len(self.amounts) != len(self.categories):
+            raise ValueError("amounts and categories must have the same length")
+        if self.dates is not None and (self.amounts is None or len(self.dates) != len(self.amounts)):
+            raise ValueError("dates must have the same length as amounts")
+        return self
+    
+    @property
+    def has_expenses(self) -> bool:
+        return bool(self.expenses or self.amounts)
 
 class AdviceRequest(BaseModel):
     user_query: str
-    financial_data: FinancialData
+    financial_data: FinancialData = FinancialData()
+    user_id: Optional[str] = None  # read spending from the server-side ledger
 
 class InvestmentPredictionRequest(BaseModel):
     investment_amount: float
     investment_type: str  # "stocks" or "gold"
     timeframe: str = "1 year"
+    seed: Optional[int] = Field(None, ge=0)
 
-# Simple categorization dictionary
-categories = {
-    "food": ["grocery", "restaurant", "dinner", "lunch", "breakfast", "food", "meal", "snack", "coffee"],
-    "travel": ["uber", "lyft", "taxi", "flight", "hotel", "airbnb", "car rental", "gas", "fuel", "train", "bus"],
-    "bills": ["rent", "electricity", "water", "internet", "phone", "utility", "insurance", "bill", "subscription"],
-    "entertainment": ["movie", "netflix", "spotify", "concert", "game", "entertainment", "music", "show", "theater"],
-    "shopping": ["amazon", "clothing", "shoes", "electronics", "furniture", "shopping", "store", "mall"],
-    "misc": []
-}
+class SimulationRequest(BaseModel):
+    investment_amount: float
+    investment_type: str  # "stocks" or "gold"
+    timeframe: str = "1 year"
+    n_paths: int = Field(10000, ge=1, le=100000)
+    seed: Optional[int] = Field(None, ge=0)
 
-class InvestmentPredictor:
-    """ML-based investment prediction model"""
-    
-    def __init__(self):
-        # Historical market data patterns (simplified)
-        self.stock_historical_data = {
-            'nifty50': [15000, 15200, 14800, 15500, 15800, 16200, 15900, 16500, 16800, 17200],
-            'sensex': [50000, 50500, 49800, 51200, 51800, 52500, 52200, 53000, 53500, 54000]
-        }
-        
-        self.gold_historical_data = {
-            'price_per_gram': [4500, 4550, 4600, 4650, 4700, 4750, 4800, 4850, 4900, 4950]
-        }
-    
-    def predict_stock_returns(self, investment_amount: float, timeframe: str = "1 year") -> Dict:
-        """Predict stock market returns using ML model"""
-        # Simulate ML model prediction
-        # In a real implementation, this would use actual ML models trained on historical data
-        
-        # Calculate volatility and trend from historical data
-        nifty_returns = np.diff(self.stock_historical_data['nifty50']) / self.stock_historical_data['nifty50'][:-1]
-        avg_return = np.mean(nifty_returns)
-        volatility = np.std(nifty_returns)
-        
-        # Add some randomness to simulate market uncertainty
-        market_sentiment = random.uniform(0.8, 1.2)  # Bullish to bearish sentiment
-        
-        # Calculate predicted return (annualized)
-        base_return = avg_return * 12 * market_sentiment  # Annualize monthly returns
-        predicted_return = max(0.05, min(0.25, base_return))  # Cap between 5% and 25%
-        
-        # Calculate predicted value
-        predicted_value = investment_amount * (1 + predicted_return)
-        
-        # Calculate confidence based on market stability
-        confidence = max(0.6, 1 - volatility * 2)
-        
-        # Determine risk level
-        if predicted_return < 0.08:
-            risk_level = "Low"
-        elif predicted_return < 0.15:
-            risk_level = "Medium"
-        else:
-            risk_level = "High"
-        
-        return {
-            "current_value": investment_amount,
-            "predicted_return": predicted_return,
-            "predicted_value": predicted_value,
-            "confidence": confidence,
-            "timeframe": timeframe,
-            "risk_level": risk_level,
-            "market_sentiment": "Bullish" if market_sentiment > 1.1 else "Bearish" if market_sentiment < 0.9 else "Neutral",
-            "recommendation": self._get_stock_recommendation(predicted_return, confidence)
-        }
-    
-    def predict_gold_returns(self, investment_amount: float, timeframe: str = "1 year") -> Dict:
-        """Predict gold returns using ML model"""
-        # Simulate ML model prediction for gold
-        
-        # Calculate gold price trend
-        gold_returns = np.diff(self.gold_historical_data['price_per_gram']) / self.gold_historical_data['price_per_gram'][:-1]
-        avg_gold_return = np.mean(gold_returns)
-        gold_volatility = np.std(gold_returns)
-        
-        # Gold is generally more stable than stocks
-        gold_sentiment = random.uniform(0.9, 1.1)  # More stable sentiment
-        
-        # Calculate predicted return (annualized)
-        base_gold_return = avg_gold_return * 12 * gold_sentiment
-        predicted_return = max(0.02, min(0.15, base_gold_return))  # Cap between 2% and 15%
-        
-        # Calculate predicted value
-        predicted_value = investment_amount * (1 + predicted_return)
-        
-        # Gold has higher confidence due to stability
-        confidence = max(0.7, 1 - gold_volatility * 1.5)
-        
-        return {
-            "current_value": investment_amount,
-            "predicted_return": predicted_return,
-            "predicted_value": predicted_value,
-            "confidence": confidence,
-            "timeframe": timeframe,
-            "risk_level": "Low",
-            "market_sentiment": "Stable",
-            "recommendation": self._get_gold_recommendation(predicted_return, confidence)
-        }
-    
-    def _get_stock_recommendation(self, predicted_return: float, confidence: float) -> str:
-        """Generate stock investment recommendation"""
-        if predicted_return > 0.15 and confidence > 0.7:
-            return "Strong Buy - High growth potential with good confidence"
-        elif predicted_return > 0.10 and confidence > 0.6:
-            return "Buy - Good growth potential"
-        elif predicted_return > 0.05:
-            return "Hold - Moderate growth expected"
-        else:
-            return "Consider alternatives - Low growth potential"
-    
-    def _get_gold_recommendation(self, predicted_return: float, confidence: float) -> str:
-        """Generate gold investment recommendation"""
-        if predicted_return > 0.10 and confidence > 0.8:
-            return "Strong Buy - Excellent hedge with good returns"
-        elif predicted_return > 0.05 and confidence > 0.7:
-            return "Buy - Good hedge against inflation"
-        else:
-            return "Hold - Stable but low returns"
+class BatchInvestmentPredictionRequest(BaseModel):
+    investment_amounts: List[float]
+    investment_types: List[str]  # "stocks" or "gold" per element
+    timeframes: Optional[List[str]] = None  # defaults to "1 year" for every element
+    seed: Optional[int] = Field(None, ge=0)
+
+# Shared rule engine for every categorizing endpoint; keyword rules live in
+# categories.json (or CATEGORY_RULES_PATH) and are reloaded when it changes
+categorizer = ExpenseCategorizer()
+
+# Response cache for deterministic endpoints. Keys carry the rules/data
+# version, so reloaded rules or new price data never serve stale entries.
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+    shared_path=os.getenv("RESPONSE_CACHE_PATH")
+)
+
+# Number of NDJSON lines categorized per matcher pass
+BATCH_CHUNK_SIZE = 1000
 
-# Initialize predictor
-predictor = InvestmentPredictor()
+# Predictor and its offload pool, created by get_predictor/get_offloader on
+# first use so workers that never predict never import NumPy for them
+predictor: Optional["InvestmentPredictor"] = None
+offloader: Optional["PredictionOffloader"] = None
+_lazy_lock = threading.Lock()
+
+# Server-side expense ledger (SQLite at LEDGER_DB_PATH), opened by
+# get_ledger on first use so importing the app creates no database file
+ledger: Optional[ExpenseLedger] = None
+
+def get_ledger() -> ExpenseLedger:
+    """Open the expense ledger on first call"""
+    global ledger
+    with _lazy_lock:
+        if ledger is None:
+            ledger = ExpenseLedger()
+        return ledger
+
+def get_predictor() -> "InvestmentPredictor":
+    """Build the predictor and precompute its statistics on first call
+    
+    With PRICE_STORE_PATH set, statistics come from the local daily price store.
+    """
+    global predictor
+    with _lazy_lock:
+        if predictor is None:
+            from predictor import InvestmentPredictor
+            from price_store import PriceStore
+            price_store_path = os.getenv("PRICE_STORE_PATH")
+            stats_window = os.getenv("PRICE_STATS_WINDOW")
+            built = InvestmentPredictor(
+                price_store=PriceStore(price_store_path) if price_store_path else None,
+                stats_window=int(stats_window) if stats_window else None
+            )
+            built.warm_up()
+            predictor = built
+    return predictor
+
+def get_offloader() -> "PredictionOffloader":
+    """Create the prediction offload pool on first call
+    
+    CPU-heavy prediction work runs on a process pool (PREDICTION_WORKERS,
+    default one per core; 0 runs it on the threadpool) with at most
+    PREDICTION_QUEUE_SIZE jobs waiting before requests get a 503.
+    """
+    global offloader
+    if offloader is None:
+        from offload import PredictionOffloader
+        prediction_workers = os.getenv("PREDICTION_WORKERS")
+        built = PredictionOffloader(
+            get_predictor(),
+            max_workers=int(prediction_workers) if prediction_workers else None,
+            max_queue=int(os.getenv("PREDICTION_QUEUE_SIZE", "64"))
+        )
+        with _lazy_lock:
+            if offloader is None:
+                offloader = built
+    return offloader
+
+# Warm-up progress, reported by /readyz
+warm_state = {"rules": False, "spending": False, "predictor": False, "prediction_pool": False}
+ready = False
+
+def warm_up(start_pool: bool = True):
+    """Import and initialize everything this worker's role serves
+    
+    Run at startup by the lifespan handler; without it the same work happens
+    on the first request that needs it. The multi-worker launcher calls it
+    with ``start_pool=False`` before forking, so the compiled rules and
+    predictor statistics are shared copy-on-write and each worker only
+    starts its own prediction pool.
+    """
+    global ready
+    categorizer.categorize("warm up")
+    warm_state["rules"] = True
+    if _serves("parse"):
+        from spending import aggregate_by_category
+        aggregate_by_category([{"category": "misc", "amount": 0}])
+        warm_state["spending"] = True
+    if _serves("predict"):
+        get_predictor()
+        warm_state["predictor"] = True
+        if start_pool:
+            get_offloader().warm_up()
+            warm_state["prediction_pool"] = True
+    ready = start_pool
 
 @app.get("/")
 def read_root():
     return {"message": "FinVoice ML Service is running"}
 
-@app.post("/categorize")
-def categorize_expense(expense: ExpenseText):
+@app.get("/healthz")
+def healthz():
+    """Liveness: the worker is up and answering"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once warm-up has finished, 503 before"""
+    body = {"ready": ready, "role": WORKER_ROLE, "warm": warm_state}
+    if not ready:
+        return JSONResponse(body, status_code=503)
+    return body
+
+def _categorize_texts(texts: List[str]) -> List[Dict]:
+    """Categorize a batch of expense texts with a single matcher pass"""
+    parsed = [parse_utterance(text) for text in texts]
+    matched = categorizer.categorize_many([utterance.description for utterance in parsed])
+    return [
+        {"description": utterance.description, "amount": utterance.amount, "category": category}
+        for utterance, category in zip(parsed, matched)
+    ]
+
+async def _cached(namespace: str, payload, version, compute):
+    """Response cache lookup that never blocks the event loop on the shared store
+    
+    In-memory lookups are cheap enough to run inline. With RESPONSE_CACHE_PATH
+    set, a lookup may wait on SQLite, so it runs in the threadpool instead.
+    """
+    if response_cache.shared:
+        return await run_in_threadpool(response_cache.get_or_compute, namespace, payload, version, compute)
+    return response_cache.get_or_compute(namespace, payload, version, compute)
+
+@parse_router.post("/categorize")
+async def categorize_expense(expense: ExpenseText):
     """Categorize an expense based on its description"""
-    text = expense.text.lower()
+    text = normalize_text(expense.text)
+    return await _cached("categorize", text, categorizer.version, lambda: _categorize_text(text))
+
+def _categorize_text(text: str) -> Dict:
+    with stage("categorize", "extract"):
+        utterance = parse_utterance(text)
+    with stage("categorize", "match"):
+        category = categorizer.categorize(utterance.description)
     
-    # Extract amount and description
-    words = text.split()
-    amount = None
-    description = ""
+    return {
+        "description": utterance.description,
+        "amount": utterance.amount,
+        "category": category
+    }
+
+@parse_router.post("/categorize/batch")
+async def categorize_batch(request: Request):
+    """Categorize many expenses at once from a JSON list or an NDJSON stream
     
-    for word in words:
-        if word.replace('.', '', 1).isdigit():
-            amount = float(word)
-        else:
-            description += word + " "
+    A JSON body looks like {"texts": ["add coffee 150", ...]} and returns
+    {"results": [...]} in input order. An application/x-ndjson body has one
+    text per line (either a JSON string or {"text": ...}) and is answered
+    with one NDJSON result per line, categorized in chunks as it streams in;
+    a line that cannot be read is answered with an error record instead.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type:
+        try:
+            return await _spooled(lambda spool: _categorize_ndjson(request, spool))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid NDJSON body: {str(e)}")
     
-    description = description.strip()
+    try:
+        batch = BatchExpenseText.model_validate_json(await request.body())
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch request: {str(e)}")
     
-    # If we couldn't extract an amount, check for patterns like "add dinner 300"
-    if amount is None:
-        for i, word in enumerate(words):
-            if i < len(words) - 1 and word.lower() == "add":
-                description = words[i+1]
-                if i + 2 < len(words) and words[i+2].replace('.', '', 1).isdigit():
-                    amount = float(words[i+2])
-                    break
+    return FastJSONResponse({"results": await run_in_threadpool(_categorize_texts, batch.texts)})
+
+def _ndjson_text(line: bytes) -> str:
+    """Read the expense text from a single NDJSON line"""
+    item = loads(line)
+    text = item.get("text") if isinstance(item, dict) else item
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        text = str(text)
+    if not isinstance(text, str):
+        raise ValueError('expected a JSON string or an object with a "text" string')
+    return text
+
+def _categorize_ndjson_lines(lines: List[tuple]) -> bytes:
+    """Categorize numbered NDJSON lines; unreadable lines get an error record in place"""
+    texts: List[Optional[str]] = []
+    errors = {}
+    for number, line in lines:
+        try:
+            texts.append(_ndjson_text(line))
+        except ValueError as e:
+            texts.append(None)
+            errors[number] = str(e)
+    results = iter(_categorize_texts([text for text in texts if text is not None]))
+    return b"".join(
+        dumps(next(results) if text is not None else {"line": number, "error": errors[number]}) + b"\n"
+        for (number, _), text in zip(lines, texts)
+    )
+
+def _spool_ndjson_lines(spool, lines: List[tuple]):
+    spool.write(_categorize_ndjson_lines(lines))
+
+async def _categorize_ndjson(request: Request, spool):
+    """Categorize an NDJSON request body chunk by chunk into ``spool``
     
-    # Categorize based on keywords
-    category = "misc"  # Default category
-    for cat, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in description:
-                category = cat
-                break
-        if category != "misc":
-            break
+    A bad line does not fail the request; it is answered with
+    {"line": n, "error": ...} in its place (lines are numbered from 1).
+    Lines longer than codec.MAX_LINE_BYTES raise ValueError.
+    """
+    splitter = LineSplitter()
+    numbered = []
+    count = 0
+    async for chunk in request.stream():
+        for line in splitter.feed(chunk):
+            count += 1
+            if line.strip():
+                numbered.append((count, line))
+        if len(numbered) >= BATCH_CHUNK_SIZE:
+            await run_in_threadpool(_spool_ndjson_lines, spool, numbered)
+            numbered = []
     
+    for line in splitter.finish():
+        if line.strip():
+            numbered.append((count + 1, line))
+    if numbered:
+        await run_in_threadpool(_spool_ndjson_lines, spool, numbered)
+
+@parse_router.post("/parse-voice-input")
+async def parse_voice_input(expense: ExpenseText):
+    """Parse voice input to extract expense details"""
+    text = normalize_text(expense.text)
+    return await _cached("parse-voice-input", text, categorizer.version, lambda: _parse_voice_text(text))
+
+# Longest transcript fragment accepted in one WebSocket frame
+MAX_VOICE_FRAME_CHARS = 4096
+
+def _voice_frame(message: str):
+    """Text and final flag of a voice stream frame; raises ValueError when malformed"""
+    if len(message) > MAX_VOICE_FRAME_CHARS:
+        raise ValueError(f"frame longer than {MAX_VOICE_FRAME_CHARS} characters")
+    frame = loads(message)
+    if not isinstance(frame, dict) or not isinstance(frame.get("text"), str):
+        raise ValueError('frames must be objects with a "text" string')
+    return frame["text"], frame.get("final", True) is not False
+
+@parse_router.websocket("/parse-voice-input/stream")
+async def parse_voice_input_stream(websocket: WebSocket):
+    """Parse a stream of voice transcript into expenses over one WebSocket
+    
+    Each frame is {"text": ..., "final": true}. Non-final frames are transcript
+    fragments that may break anywhere; a final frame (the default) ends the
+    utterance. Every expense is sent back as soon as a separator ("and", ",",
+    ";") or the end of the utterance completes it, as
+    {"index", "text", "description", "amount", "category"}. Malformed frames
+    get an {"error": ...} frame and the connection stays open.
+    """
+    await websocket.accept()
+    splitter = UtteranceSplitter()
+    index = 0
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                text, final = _voice_frame(message)
+            except ValueError as e:
+                await websocket.send_text(dumps({"error": str(e)}).decode())
+                continue
+            utterances = splitter.feed(text)
+            if final:
+                utterances += splitter.flush()
+            if not utterances:
+                continue
+            parsed = [parse_utterance(utterance) for utterance in utterances]
+            categories = categorizer.categorize_many([utterance.description for utterance in parsed])
+            for segment, utterance, category in zip(utterances, parsed, categories):
+                await websocket.send_text(dumps({
+                    "index": index,
+                    "text": segment,
+                    "description": utterance.description,
+                    "amount": utterance.amount,
+                    "category": category
+                }).decode())
+                index += 1
+    except WebSocketDisconnect:
+        pass
+
+def _parse_voice_text(text: str) -> Dict:
+    """Extract description, amount and category from a voice utterance"""
+    utterance = parse_utterance(text, categorizer.categorize)
     return {
-        "description": description,
-        "amount": amount,
-        "category": category
+        "description": utterance.description,
+        "amount": utterance.amount,
+        "category": utterance.category
     }
 
-@app.post("/parse-voice-input")
-def parse_voice_input(expense: ExpenseText):
-    """Parse voice input to extract expense details"""
-    text = expense.text.lower()
+# Advice templates; each is offered only when the numbers it quotes exist
+ADVICE_TEMPLATES = {
+    "save": "Based on your spending, you could save {amount} on {category} by reducing expenses by 20%.",
+    "budget": "I notice you spent {total} on {category} last month. Consider setting a budget of {budget}.",
+    "goal": "To reach your {goal_name} goal faster, try redirecting {amount} from {category} to savings.",
+    "above_average": "Your spending in {category} is {percentage}% higher than average. Look for ways to reduce these expenses.",
+    "below_last_month": "Great job keeping your {category} expenses low! You're saving {amount} compared to last month.",
+    "spike": "Your {category} spending jumped to {amount} in the week of {week}, against a usual {usual} a week. Was that a one-off?",
+    "goal_deposit": "To reach your {goal_name} goal by {deadline}, set aside {amount} a month.",
+    "goal_cut": "Cutting {category} by {amount} a month would close the gap to your goals.",
+    "goal_shortfall": "Your goals need {shortfall} a month more than your savings and spending cuts can cover. Consider moving a deadline.",
+}
+
+# Number of NDJSON expenses aggregated per group-by in the streaming variant
+ADVICE_CHUNK_SIZE = 10000
+
+def _advice_candidates(aggregator: "CategoryAggregator", trends: Optional[Dict],
+                       goals: Optional[List[Goal]], goal_plan: Optional[Dict] = None) -> List[str]:
+    """Every advice sentence the data supports"""
+    category, spent = aggregator.highest() or ("misc", 0)
+    goal_name = goals[0].name if goals else "savings"
+    candidates = [
+        ADVICE_TEMPLATES["save"].format(category=category, amount=round(spent * 0.2)),
+        ADVICE_TEMPLATES["goal"].format(goal_name=goal_name, category=category, amount=round(spent * 0.2)),
+    ]
+    if goal_plan is not None:
+        for goal in goal_plan["goals"]:
+            if goal["required_monthly_savings"]:
+                candidates.append(ADVICE_TEMPLATES["goal_deposit"].format(
+                    goal_name=goal["name"], deadline=goal["deadline"], amount=round(goal["required_monthly_savings"])))
+        for cut in goal_plan["cuts"]:
+            candidates.append(ADVICE_TEMPLATES["goal_cut"].format(category=cut["category"], amount=round(cut["cut"])))
+        if goal_plan["shortfall"] > 0:
+            candidates.append(ADVICE_TEMPLATES["goal_shortfall"].format(shortfall=round(goal_plan["shortfall"])))
+    if trends is None:
+        return candidates
     
-    # Simple parsing logic for "add [description] [amount]"
-    words = text.split()
-    amount = None
-    description = ""
+    stats = trends["categories"]
+    current = next(row for row in stats if row["category"] == category)
+    if current["last_month"] > 0:
+        candidates.append(ADVICE_TEMPLATES["budget"].format(
+            category=category, total=current["last_month"], budget=round(current["last_month"] * 0.8)))
+    above = max(stats, key=lambda row: row["vs_average"] or 0)
+    if (above["vs_average"] or 0) > 0:
+        candidates.append(ADVICE_TEMPLATES["above_average"].format(
+            category=above["category"], percentage=above["vs_average"]))
+    saved = max(stats, key=lambda row: row["previous_month"] - row["last_month"])
+    if saved["previous_month"] > saved["last_month"]:
+        candidates.append(ADVICE_TEMPLATES["below_last_month"].format(
+            category=saved["category"], amount=round(saved["previous_month"] - saved["last_month"])))
+    if trends["spikes"]:
+        spike = trends["spikes"][0]
+        candidates.append(ADVICE_TEMPLATES["spike"].format(
+            category=spike["category"], amount=round(spike["amount"]), week=spike["week"], usual=round(spike["usual"])))
+    return candidates
+
+def _monthly_spending(aggregator: "CategoryAggregator", trends: Optional[Dict]) -> Dict[str, float]:
+    """Spending per category in a typical month
     
-    # Check for "add" pattern
-    if len(words) >= 3 and words[0].lower() == "add":
-        description = words[1]
-        try:
-            amount = float(words[2])
-        except ValueError:
-            pass
-    
-    # If the above pattern doesn't match, try to find any number in the text
-    if amount is None:
-        for word in words:
-            if word.replace('.', '', 1).isdigit():
-                amount = float(word)
-                # Remove the amount from the description
-                words.remove(word)
-                break
-    
-    # If we still don't have a description, use all words except "add" and the amount
-    if not description:
-        description = " ".join([w for w in words if w.lower() != "add" and not w.replace('.', '', 1).isdigit()])
-    
-    # Categorize the expense
-    category = "misc"  # Default category
-    for cat, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in description.lower():
-                category = cat
-                break
-        if category != "misc":
-            break
+    That is the last complete month, or the recent daily average over 30 days
+    when no month is complete. Undated expenses are taken as one month's worth.
+    """
+    if trends is None:
+        return aggregator.totals()
+    if trends["last_month"] is not None:
+        return {row["category"]: row["last_month"] for row in trends["categories"]}
+    return {row["category"]: row["daily_average"] * 30 for row in trends["categories"]}
+
+def _goal_plan(aggregator: "CategoryAggregator", trends: Optional[Dict], data: FinancialData) -> Optional[Dict]:
+    """Required deposits, category cuts and completion dates for goals with a target amount"""
+    targeted = [goal for goal in data.goals or [] if goal.target_amount is not None]
+    if not targeted:
+        return None
+    from goals import SAVINGS_ANNUAL_RETURN, project_goals
+    
+    spending = _monthly_spending(aggregator, trends)
+    if data.monthly_savings is not None:
+        monthly_savings = data.monthly_savings
+    elif data.monthly_income is not None:
+        monthly_savings = max(data.monthly_income - sum(spending.values()), 0.0)
+    else:
+        monthly_savings = 0.0
+    # Only goals invested in stocks or gold need the predictor
+    annual_returns = {"savings": SAVINGS_ANNUAL_RETURN}
+    for investment_type in {goal.investment_type for goal in targeted} - {"savings"}:
+        annual_returns[investment_type] = get_predictor().expected_annual_return(investment_type)
+    return project_goals([goal.model_dump() for goal in targeted], spending, monthly_savings, annual_returns,
+                         [scenario.model_dump() for scenario in data.scenarios])
+
+def _build_advice(aggregator: "CategoryAggregator", trends: Optional[Dict], goals: Optional[List[Goal]],
+                  goal_plan: Optional[Dict] = None) -> Dict:
+    """Pick an advice sentence backed by the category totals, spending trends and goal plan"""
+    advice = random.choice(_advice_candidates(aggregator, trends, goals, goal_plan))
     
+    total = aggregator.total
     return {
-        "description": description.strip(),
-        "amount": amount,
-        "category": category
+        "advice": advice,
+        "category_insights": [
+            {"category": cat, "amount": amt, "percentage": round(amt / total * 100) if total > 0 else 0}
+            for cat, amt in aggregator.totals().items()
+        ],
+        "trends": trends,
+        "goal_plan": goal_plan
     }
 
-@app.post("/financial-advice")
+@parse_router.post("/financial-advice")
 def get_financial_advice(request: AdviceRequest):
     """Generate financial advice based on user query and financial data"""
-    # Mock advice responses
-    advice_templates = [
-        "Based on your spending, you could save {amount} on {category} by reducing expenses by 20%.",
-        "I notice you spent {total} on {category} last month. Consider setting a budget of {budget}.",
-        "To reach your {goal_name} goal faster, try redirecting {amount} from {category} to savings.",
-        "Your spending in {category} is {percentage}% higher than average. Look for ways to reduce these expenses.",
-        "Great job keeping your {category} expenses low! You're saving {amount} compared to last month."
-    ]
+    from spending import CategoryAggregator, aggregate_by_category
     
-    # Extract categories and total spending
-    category_totals = {}
-    for expense in request.financial_data.expenses:
-        category = expense.get("category", "misc")
-        amount = expense.get("amount", 0)
-        if category in category_totals:
-            category_totals[category] += amount
+    # With a user id and no inline expenses, use the ledger's per-day totals
+    data = request.financial_data
+    try:
+        if request.user_id is not None and not data.has_expenses:
+            with stage("financial_advice", "ledger"):
+                aggregator = CategoryAggregator()
+                categories, days, totals = get_ledger().daily_totals(request.user_id)
+                aggregator.add(categories, totals, days)
         else:
-            category_totals[category] = amount
-    
-    # Find highest spending category
-    highest_category = max(category_totals.items(), key=lambda x: x[1]) if category_totals else ("misc", 0)
-    
-    # Generate advice
-    import random
-    advice_template = random.choice(advice_templates)
-    
-    # Fill in template
-    advice = advice_template.format(
-        category=highest_category[0],
-        amount=round(highest_category[1] * 0.2),  # 20% of highest spending
-        total=highest_category[1],
-        budget=round(highest_category[1] * 0.8),  # 80% of current spending
-        goal_name=request.financial_data.goals[0].get("name", "savings") if request.financial_data.goals else "savings",
-        percentage=random.randint(15, 30)  # Random percentage for demonstration
-    )
+            with stage("financial_advice", "aggregate"):
+                aggregator = aggregate_by_category(data.expenses)
+                if data.amounts is not None:
+                    aggregator.add(data.categories, data.amounts, data.dates)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid expenses: {str(e)}")
     
-    return {
-        "advice": advice,
-        "category_insights": [
-            {"category": cat, "amount": amt, "percentage": round(amt / sum(category_totals.values()) * 100) if sum(category_totals.values()) > 0 else 0}
-            for cat, amt in category_totals.items()
-        ]
-    }
+    with stage("financial_advice", "trends"):
+        trends = aggregator.trends()
+    
+    with stage("financial_advice", "goals"):
+        goal_plan = _goal_plan(aggregator, trends, data)
+    
+    with stage("financial_advice", "advice"):
+        return _build_advice(aggregator, trends, data.goals, goal_plan)
 
-@app.post("/predict-investment")
-def predict_investment(request: InvestmentPredictionRequest):
-    """Predict investment returns using ML models"""
+_goal_list = TypeAdapter(List[Goal])
+
+def _stream_goals(goals) -> List[Goal]:
+    """Validate a goals line of the advice stream, which skips model validation"""
+    return _goal_list.validate_python(goals)
+
+def _add_advice_lines(aggregator: "CategoryAggregator", lines: List[bytes],
+                      goals: Optional[List[Goal]]) -> Optional[List[Goal]]:
+    """Fold advice stream lines into ``aggregator``; returns the latest goals"""
+    batch = []
+    for line in lines:
+        if line.strip():
+            item = loads(line)
+            if "goals" in item:
+                goals = _stream_goals(item["goals"])
+            else:
+                batch.append(item)
+    aggregator.add_expenses(batch)
+    return goals
+
+def _stream_advice(aggregator: "CategoryAggregator", goals: Optional[List[Goal]]) -> Dict:
+    trends = aggregator.trends()
+    goal_plan = _goal_plan(aggregator, trends, FinancialData(goals=goals))
+    return _build_advice(aggregator, trends, goals, goal_plan)
+
+@parse_router.post("/financial-advice/stream")
+async def get_financial_advice_stream(request: Request, user_query: str = ""):
+    """Generate financial advice from an NDJSON stream of expenses
+    
+    Each line is an expense object such as {"category": "food", "amount": 300};
+    a line with a "goals" key supplies the goals list instead. Expenses are
+    aggregated chunk by chunk as they arrive, off the event loop, so the
+    full history is never held in memory. Lines longer than
+    codec.MAX_LINE_BYTES are rejected.
+    """
+    from spending import CategoryAggregator
+    
+    aggregator = CategoryAggregator()
+    goals = None
+    splitter = LineSplitter()
+    lines = []
+    try:
+        async for chunk in request.stream():
+            lines += splitter.feed(chunk)
+            if len(lines) >= ADVICE_CHUNK_SIZE:
+                goals = await run_in_threadpool(_add_advice_lines, aggregator, lines, goals)
+                lines = []
+        lines += splitter.finish()
+        goals = await run_in_threadpool(_add_advice_lines, aggregator, lines, goals)
+    except (TypeError, ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid expense stream: {str(e)}")
+    
+    return await run_in_threadpool(_stream_advice, aggregator, goals)
+
+@parse_router.post("/ledger/{user_id}/expenses")
+def append_ledger_expenses(user_id: str, request: LedgerAppend):
+    """Append expenses to a user's ledger, categorizing any without a category"""
+    expenses = [expense.model_dump() for expense in request.expenses]
+    missing = [expense for expense in expenses if not expense["category"]]
+    for expense, category in zip(missing, categorizer.categorize_many([e["description"] for e in missing])):
+        expense["category"] = category
+    return {"expenses": get_ledger().append(user_id, expenses)}
+
+@parse_router.post("/ledger/{user_id}/voice")
+def append_ledger_voice(user_id: str, expense: ExpenseText):
+    """Parse a voice utterance and append the resulting expense to the ledger"""
+    parsed = _parse_voice_text(expense.text)
+    if parsed["amount"] is None:
+        raise HTTPException(status_code=400, detail="Could not find an amount in the voice input")
+    return get_ledger().append(user_id, [parsed])[0]
+
+@parse_router.get("/ledger/{user_id}/summary")
+def get_ledger_summary(user_id: str):
+    """Running totals for a user, per category and per month"""
+    return get_ledger().summary(user_id)
+
+@parse_router.post("/import-statement")
+async def import_statement(request: Request, statement_format: Optional[Literal["csv", "ofx"]] = Query(None, alias="format")):
+    """Categorize an uploaded bank statement (CSV or OFX) into NDJSON
+    
+    The statement is either the file part of a multipart/form-data upload or
+    the raw request body. It is parsed and categorized chunk by chunk as it
+    arrives and the answer is spooled, so memory use does not grow with its
+    length. Each transaction is answered with {"line", "date", "description",
+    "amount", "type", "category"}, a row that cannot be read with
+    {"line": n, "error": ...}, and the last line holds the per-category debit
+    totals. An upload that is not a statement at all gets a 400.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        upload = MultipartFileReader(content_type) if content_type.startswith("multipart/form-data") else None
+    except StatementError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {str(e)}")
+    
+    async def fill(spool):
+        statement = StatementImport(StatementReader(statement_format), upload, categorizer.categorize_many, spool,
+                                    batch_size=BATCH_CHUNK_SIZE)
+        async for chunk in request.stream():
+            await run_in_threadpool(statement.feed, chunk)
+        await run_in_threadpool(statement.finish)
+    
     try:
-        if request.investment_type.lower() == "stocks":
-            prediction = predictor.predict_stock_returns(request.investment_amount, request.timeframe)
-        elif request.investment_type.lower() == "gold":
-            prediction = predictor.predict_gold_returns(request.investment_amount, request.timeframe)
+        return await _spooled(fill)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid statement: {str(e)}")
+
+def _rng(seed: Optional[int]) -> Optional["np.random.Generator"]:
+    """Seeded random generator for reproducible predictions, if a seed is given"""
+    if seed is None:
+        return None
+    import numpy as np
+    return np.random.default_rng(seed)
+
+async def _offloaded_prediction(namespace: str, request: BaseModel, method: str, *args):
+    """Run a predictor method on the offload pool, serving seeded requests from the cache"""
+    from offload import OffloadFailed, OffloadSaturated
+    
+    key = None
+    if getattr(request, "seed", None) is not None:
+        key = ResponseCache.make_key(namespace, request.model_dump(), get_predictor().data_version)
+        if response_cache.shared:
+            found, value = await run_in_threadpool(response_cache.get, key)
         else:
-            raise HTTPException(status_code=400, detail="Invalid investment type. Use 'stocks' or 'gold'")
-        
-        return prediction
+            found, value = response_cache.get(key)
+        if found:
+            return value
+    
+    try:
+        value = await get_offloader().run(method, *args)
+    except OffloadSaturated:
+        raise HTTPException(status_code=503, detail="Prediction service is busy, please retry")
+    except OffloadFailed:
+        raise HTTPException(status_code=503, detail="Prediction worker restarted, please retry")
+    
+    if key is not None:
+        if response_cache.shared:
+            await run_in_threadpool(response_cache.set, key, value)
+        else:
+            response_cache.set(key, value)
+    return value
+
+@predict_router.post("/predict-investment")
+async def predict_investment(request: InvestmentPredictionRequest):
+    """Predict investment returns using ML models"""
+    investment_type = request.investment_type.lower()
+    if investment_type not in ("stocks", "gold"):
+        raise HTTPException(status_code=400, detail="Invalid investment type. Use 'stocks' or 'gold'")
+    
+    method = "predict_stock_returns" if investment_type == "stocks" else "predict_gold_returns"
+    try:
+        return await _offloaded_prediction(f"predict-{investment_type}", request, method,
+                                           request.investment_amount, request.timeframe, _rng(request.seed))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-@app.post("/predict-stocks")
-def predict_stocks(request: InvestmentPredictionRequest):
+@predict_router.post("/predict-investment/batch")
+async def predict_investment_batch(request: BatchInvestmentPredictionRequest):
+    """Predict returns for many investments in one vectorized pass"""
+    timeframes = request.timeframes or ["1 year"] * len(request.investment_amounts)
+    if not len(request.investment_amounts) == len(request.investment_types) == len(timeframes):
+        raise HTTPException(status_code=400, detail="investment_amounts, investment_types and timeframes must have the same length")
+    
+    try:
+        predictions = await _offloaded_prediction("predict-batch", request, "predict_batch", request.investment_amounts,
+                                                  request.investment_types, timeframes, _rng(request.seed))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return FastJSONResponse({"predictions": predictions})
+
+@predict_router.post("/simulate-investment")
+async def simulate_investment(request: SimulationRequest):
+    """Monte Carlo projection with percentiles and probability of loss"""
+    try:
+        return await _offloaded_prediction("simulate-investment", request, "simulate_returns", request.investment_amount,
+                                           request.investment_type, request.timeframe, request.n_paths, request.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@predict_router.post("/predict-stocks")
+async def predict_stocks(request: InvestmentPredictionRequest):
     """Predict stock market returns"""
     try:
-        prediction = predictor.predict_stock_returns(request.investment_amount, request.timeframe)
-        return prediction
+        return await _offloaded_prediction("predict-stocks", request, "predict_stock_returns",
+                                           request.investment_amount, request.timeframe, _rng(request.seed))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stock prediction failed: {str(e)}")
 
-@app.post("/predict-gold")
-def predict_gold(request: InvestmentPredictionRequest):
+@predict_router.post("/predict-gold")
+async def predict_gold(request: InvestmentPredictionRequest):
     """Predict gold returns"""
     try:
-        prediction = predictor.predict_gold_returns(request.investment_amount, request.timeframe)
-        return prediction
+        return await _offloaded_prediction("predict-gold", request, "predict_gold_returns",
+                                           request.investment_amount, request.timeframe, _rng(request.seed))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gold prediction failed: {str(e)}")
 
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Response cache hit/miss counters"""
+    return response_cache.stats()
+
+def _service_metrics() -> List[str]:
+    """Response cache and offload pool counters in Prometheus format"""
+    cache_stats = response_cache.stats()
+    lines = [
+        "# TYPE finvoice_cache_requests_total counter",
+        f'finvoice_cache_requests_total{{result="hit"}} {cache_stats["hits"]}',
+        f'finvoice_cache_requests_total{{result="shared_hit"}} {cache_stats["shared_hits"]}',
+        f'finvoice_cache_requests_total{{result="miss"}} {cache_stats["misses"]}',
+    ]
+    # Reported once predictions have started, without creating the pool here
+    if offloader is not None:
+        offload_stats = offloader.stats()
+        lines += [
+            "# TYPE finvoice_prediction_jobs_in_flight gauge",
+            f"finvoice_prediction_jobs_in_flight {offload_stats['in_flight']}",
+            "# TYPE finvoice_prediction_jobs_rejected_total counter",
+            f"finvoice_prediction_jobs_rejected_total {offload_stats['rejected']}",
+        ]
+    return lines
+
+metrics_registry.add_collector(_service_metrics)
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics"""
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@predict_router.get("/offload/stats")
+def get_offload_stats():
+    """Prediction pool size, queue depth and rejections"""
+    return get_offloader().stats()
+
+if _serves("parse"):
+    app.include_router(parse_router)
+if _serves("predict"):
+    app.include_router(predict_router)
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    import uvicorn
+    
+    # Auto-reload is for development only (RELOAD=1); it adds a file watcher
+    uvicorn.run("main:app", host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")),
+                reload=os.getenv("RELOAD", "0").lower() in ("1", "true", "yes", "on"))
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""Lightweight hot-path instrumentation with Prometheus text export
+
+Records per-route latency and request/response size histograms (through
+``MetricsMiddleware``) and per-stage timers inside handlers and the
+predictor (through ``stage``). With METRICS_ENABLED=0 the middleware is a
+pass-through and ``stage`` returns a shared no-op context manager, so the
+instrumentation costs a flag check.
+
+A sampling profiler can be requested per call with an ``X-Profile: 1``
+header when PROFILING_ENABLED=1. It samples every thread's stack while the
+request runs and, if the request took at least PROFILE_SLOW_MS, writes the
+samples in folded-stack format (flamegraph.pl / speedscope) to PROFILE_DIR.
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off", "")
+
+
+class Histogram:
+    """Prometheus-style histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.9g}" if base else f"{self.name}_sum {total:.9g}")
+            lines.append(f"{self.name}_count{{{base}}} {count}" if base else f"{self.name}_count {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Holds the service's histograms plus extra collectors for /metrics"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.request_latency = Histogram(
+            "finvoice_request_duration_seconds", "Request latency by route",
+            ("method", "route", "status"), LATENCY_BUCKETS)
+        self.request_size = Histogram(
+            "finvoice_request_size_bytes", "Request body size by route", ("method", "route"), SIZE_BUCKETS)
+        self.response_size = Histogram(
+            "finvoice_response_size_bytes", "Response body size by route", ("method", "route"), SIZE_BUCKETS)
+        self.stage_latency = Histogram(
+            "finvoice_stage_duration_seconds", "Time spent in each stage of a handler",
+            ("operation", "stage"), LATENCY_BUCKETS)
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._capture = threading.local()
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Register a callable returning extra exposition lines"""
+        self._collectors.append(collector)
+
+    def record_stage(self, operation: str, name: str, seconds: float):
+        captured = getattr(self._capture, "samples", None)
+        if captured is not None:
+            captured.append((operation, name, seconds))
+        else:
+            self.stage_latency.observe((operation, name), seconds)
+
+    @contextmanager
+    def capture(self) -> Iterator[List[Tuple[str, str, float]]]:
+        """Collect this thread's stage samples in a list instead of recording them
+
+        Used by worker processes to ship their timings back to the parent,
+        which records them with ``record_samples``.
+        """
+        samples: List[Tuple[str, str, float]] = []
+        self._capture.samples = samples
+        try:
+            yield samples
+        finally:
+            self._capture.samples = None
+
+    def record_samples(self, samples: Sequence[Tuple[str, str, float]]):
+        for operation, name, seconds in samples:
+            self.stage_latency.observe((operation, name), seconds)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in (self.request_latency, self.request_size, self.response_size, self.stage_latency):
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=_flag("METRICS_ENABLED", "1"))
+
+
+class _StageTimer:
+    __slots__ = ("operation", "name", "start")
+
+    def __init__(self, operation: str, name: str):
+        self.operation = operation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.record_stage(self.operation, self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(operation: str, name: str):
+    """Time a block as one stage of an operation, e.g. stage("categorize", "match")"""
+    if not registry.enabled:
+        return _NULL_TIMER
+    return _StageTimer(operation, name)
+
+
+class SamplingProfiler:
+    """Samples all thread stacks at a fixed interval on a background thread"""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="finvoice-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and payload sizes"""
+
+    def __init__(self, app, profile_dir: Optional[str] = None):
+        self.app = app
+        self.profiling = _flag("PROFILING_ENABLED", "0")
+        self.profile_dir = profile_dir or os.getenv("PROFILE_DIR", "profiles")
+        self.profile_slow = float(os.getenv("PROFILE_SLOW_MS", "100")) / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal response_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        profiler = None
+        if self.profiling and (b"x-profile", b"1") in scope.get("headers", ()):
+            profiler = SamplingProfiler().start()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Label by route template so path parameters don't explode cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            registry.request_latency.observe((method, route, str(status)), elapsed)
+            registry.request_size.observe((method, route), request_bytes)
+            registry.response_size.observe((method, route), response_bytes)
+            if profiler is not None:
+                profiler.stop()
+                if elapsed >= self.profile_slow:
+                    self._dump_profile(profiler, route, elapsed)
+
+    def _dump_profile(self, profiler: SamplingProfiler, route: str, elapsed: float):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = "%d-%s.folded" % (time.time() * 1000, route.strip("/").replace("/", "_") or "root")
+        path = os.path.join(self.profile_dir, name)
+        with open(path, "w") as f:
+            f.write(profiler.folded())
+        logger.warning("Slow request to %s took %.1f ms, profile written to %s", route, elapsed * 1000, path)
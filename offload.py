@@ -0,0 +1,139 @@
+"""Process-pool offload for CPU-heavy prediction work
+
+Prediction and simulation run in worker processes with their own
+InvestmentPredictor, so NumPy work holding the GIL never stalls the event
+loop serving cheap endpoints. Admission is bounded: once every worker is
+busy and the queue is full, new work is rejected immediately instead of
+piling up behind it. A pool broken by a dying worker (OOM, a kill) is
+replaced on the next call.
+"""
+import asyncio
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from predictor import InvestmentPredictor
+from price_store import PriceStore
+
+# Predictor owned by each worker process
+_worker_predictor: Optional[InvestmentPredictor] = None
+
+
+class OffloadSaturated(Exception):
+    """Raised when the worker pool and its queue are full"""
+
+
+class OffloadFailed(Exception):
+    """Raised for jobs lost when a worker process died; the pool is rebuilt"""
+
+
+def _exit_with_parent():
+    """On Linux, have the kernel terminate this process if its parent dies"""
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+            ctypes.CDLL(None).prctl(1, signal.SIGTERM)  # PR_SET_PDEATHSIG
+        except (OSError, AttributeError):
+            pass
+
+
+def _init_worker(price_store_path: Optional[str], stats_window: Optional[int]):
+    global _worker_predictor
+    # Forked from a server that captures these signals; the pool's owner
+    # decides when workers stop, and a terminated worker should just exit
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _exit_with_parent()
+    _worker_predictor = InvestmentPredictor(
+        price_store=PriceStore(price_store_path) if price_store_path else None,
+        stats_window=stats_window
+    )
+    _worker_predictor.warm_up()
+
+
+def _call_predictor(method: str, args: tuple) -> Tuple[Any, list]:
+    # Stage timings are shipped back so the parent's /metrics includes them
+    with metrics.registry.capture() as samples:
+        result = getattr(_worker_predictor, method)(*args)
+    return result, samples
+
+
+class PredictionOffloader:
+    """Runs predictor methods on a bounded ProcessPoolExecutor
+
+    With ``max_workers=0`` work runs on the default threadpool against the
+    in-process predictor instead, which is what single-core deployments and
+    tests want.
+    """
+
+    def __init__(self, predictor: InvestmentPredictor, max_workers: Optional[int] = None, max_queue: int = 64):
+        self.predictor = predictor
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def capacity(self) -> int:
+        return max(self.max_workers, 1) + self.max_queue
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            store = self.predictor.price_store
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(store.root if store is not None else None, self.predictor.stats_window)
+            )
+        return self._pool
+
+    async def run(self, method: str, *args) -> Any:
+        """Call ``predictor.<method>(*args)`` off the event loop"""
+        # Only touched from the event loop thread, so no lock is needed
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise OffloadSaturated(f"{self.in_flight} prediction jobs already in flight")
+        self.in_flight += 1
+        try:
+            if self.max_workers == 0:
+                return await run_in_threadpool(getattr(self.predictor, method), *args)
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            try:
+                result, samples = await loop.run_in_executor(pool, _call_predictor, method, args)
+            except BrokenProcessPool:
+                # Every job in flight on the broken pool fails; only the
+                # first to get here replaces it
+                if self._pool is pool:
+                    self.restarts += 1
+                    self.shutdown()
+                raise OffloadFailed("a prediction worker died") from None
+            metrics.registry.record_samples(samples)
+            return result
+        finally:
+            self.in_flight -= 1
+
+    def warm_up(self):
+        """Start the worker processes ahead of the first request"""
+        if self.max_workers > 0:
+            pool = self._get_pool()
+            for future in [pool.submit(_call_predictor, "warm_up", ()) for _ in range(self.max_workers)]:
+                future.result()
+
+    def shutdown(self, wait: bool = False):
+        """Stop the pool; ``wait`` blocks until its processes have exited"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {"workers": self.max_workers, "max_queue": self.max_queue,
+                "in_flight": self.in_flight, "rejected": self.rejected, "restarts": self.restarts}
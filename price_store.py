@@ -0,0 +1,240 @@
+"""Append-only columnar price store backed by memory-mapped NumPy arrays
+
+Each symbol is a directory of fixed-width binary columns:
+
+    dates.i8     trading dates as days since 1970-01-01 (int64, ascending)
+    close.f8     closing prices (float64)
+    cumret.f8    running sum of simple daily returns (float64, 0 for the first row)
+    cumret2.f8   running sum of squared daily returns (float64)
+
+Columns are only ever appended to, so readers can memory-map them without
+locking and only touch the pages they need. The running sums make the mean
+and standard deviation of returns over any window an O(1) lookup, and a new
+day of data extends them from the last stored value instead of rescanning
+the history. dates.i8 is written last and defines how many rows are valid.
+"""
+import argparse
+import csv
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+COLUMNS = ("cumret", "cumret2", "close", "dates")
+_SUFFIX = {"dates": ".i8", "close": ".f8", "cumret": ".f8", "cumret2": ".f8"}
+_DTYPE = {"dates": np.int64, "close": np.float64, "cumret": np.float64, "cumret2": np.float64}
+
+# Rows read from a CSV file before they are appended to the store
+INGEST_CHUNK_ROWS = 100000
+
+
+class PriceStore:
+    """Local store of daily closing prices for many symbols"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._maps: Dict[Tuple[str, str], np.ndarray] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol: str, column: str) -> str:
+        return os.path.join(self.root, symbol, column + _SUFFIX[column])
+
+    def symbols(self) -> List[str]:
+        """Return every symbol with stored prices"""
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(self._path(name, "dates")))
+
+    def __contains__(self, symbol: str) -> bool:
+        return self.version(symbol) > 0
+
+    def version(self, symbol: str) -> int:
+        """Number of stored rows; changes whenever new prices are appended"""
+        try:
+            return os.stat(self._path(symbol, "dates")).st_size // 8
+        except OSError:
+            return 0
+
+    def _column(self, symbol: str, column: str) -> np.ndarray:
+        """Memory-map a column, remapping only when it has grown"""
+        rows = self.version(symbol)
+        key = (symbol, column)
+        mapped = self._maps.get(key)
+        if mapped is None or len(mapped) != rows:
+            if rows == 0:
+                mapped = np.empty(0, dtype=_DTYPE[column])
+            else:
+                mapped = np.memmap(self._path(symbol, column), dtype=_DTYPE[column], mode="r", shape=(rows,))
+            self._maps[key] = mapped
+        return mapped
+
+    def dates(self, symbol: str) -> np.ndarray:
+        """Trading dates for a symbol as datetime64[D]"""
+        return self._column(symbol, "dates").view("datetime64[D]")
+
+    def closes(self, symbol: str) -> np.ndarray:
+        """Closing prices for a symbol"""
+        return self._column(symbol, "close")
+
+    def offset(self, symbol: str, date) -> int:
+        """Row offset of the first trading date on or after ``date``"""
+        day = np.datetime64(date, "D").astype(np.int64)
+        return int(np.searchsorted(self._column(symbol, "dates"), day, side="left"))
+
+    def append(self, symbol: str, dates: Iterable, closes: Iterable[float]) -> int:
+        """Append prices for dates after the last stored one; return rows added"""
+        days = np.asarray(np.array(list(dates), dtype="datetime64[D]"), dtype=np.int64)
+        prices = np.asarray(list(closes), dtype=np.float64)
+        if len(days) != len(prices):
+            raise ValueError("dates and closes must have the same length")
+        if len(days) == 0:
+            return 0
+
+        order = np.argsort(days, kind="stable")
+        days, prices = days[order], prices[order]
+
+        with self._lock:
+            os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+            rows = self._repair(symbol)
+            if rows:
+                last_day = self._column(symbol, "dates")[-1]
+                last_close = self._column(symbol, "close")[-1]
+                last_sum = self._column(symbol, "cumret")[-1]
+                last_sumsq = self._column(symbol, "cumret2")[-1]
+            else:
+                last_day = np.iinfo(np.int64).min
+                last_close = last_sum = last_sumsq = None
+
+            # Append-only: drop anything not strictly after the stored history
+            # (and duplicate dates within the batch)
+            keep = days > last_day
+            keep[1:] &= days[1:] != days[:-1]
+            days, prices = days[keep], prices[keep]
+            if len(days) == 0:
+                return 0
+
+            # Extend the running sums from the last stored row
+            if rows:
+                returns = prices / np.concatenate(([last_close], prices[:-1])) - 1
+                cumret = last_sum + np.cumsum(returns)
+                cumret2 = last_sumsq + np.cumsum(returns * returns)
+            else:
+                returns = prices[1:] / prices[:-1] - 1
+                cumret = np.concatenate(([0.0], np.cumsum(returns)))
+                cumret2 = np.concatenate(([0.0], np.cumsum(returns * returns)))
+
+            values = {"cumret": cumret, "cumret2": cumret2, "close": prices, "dates": days}
+            for column in COLUMNS:
+                with open(self._path(symbol, column), "ab") as f:
+                    f.write(values[column].astype(_DTYPE[column]).tobytes())
+            return len(days)
+
+    def _repair(self, symbol: str) -> int:
+        """Trim columns left longer than dates.i8 by an interrupted append"""
+        rows = self.version(symbol)
+        for column in COLUMNS[:-1]:
+            path = self._path(symbol, column)
+            if os.path.exists(path) and os.path.getsize(path) > rows * 8:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * 8)
+        return rows
+
+    def window_stats(self, symbol: str, window: Optional[int] = None,
+                     start=None, end=None) -> Tuple[int, float, float]:
+        """Count, mean and std of daily returns over a window of rows
+
+        ``start``/``end`` are dates (``end`` inclusive); ``window`` limits the
+        result to the last ``window`` returns before ``end``. Only the two
+        boundary rows of the running sums are read.
+        """
+        rows = self.version(symbol)
+        hi = rows - 1 if end is None else min(rows, self.offset(symbol, np.datetime64(end, "D") + 1)) - 1
+        lo = 0 if start is None else self.offset(symbol, start)
+        if window is not None:
+            lo = max(lo, hi - window)
+        count = hi - lo
+        if count <= 0:
+            raise ValueError(f"Not enough price history for {symbol}")
+
+        cumret, cumret2 = self._column(symbol, "cumret"), self._column(symbol, "cumret2")
+        mean = (cumret[hi] - cumret[lo]) / count
+        variance = (cumret2[hi] - cumret2[lo]) / count - mean * mean
+        return count, float(mean), float(np.sqrt(max(variance, 0.0)))
+
+    def rolling_stats(self, symbol: str, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rolling mean and std of daily returns for every row, vectorized"""
+        cumret, cumret2 = self._column(symbol, "cumret"), self._column(symbol, "cumret2")
+        if len(cumret) <= window:
+            return np.empty(0), np.empty(0)
+        mean = (cumret[window:] - cumret[:-window]) / window
+        variance = (cumret2[window:] - cumret2[:-window]) / window - mean * mean
+        return mean, np.sqrt(np.maximum(variance, 0.0))
+
+    def ingest_csv(self, path: str, symbol: Optional[str] = None) -> Dict[str, int]:
+        """Stream a CSV of date,close[,symbol] rows into the store"""
+        with open(path, newline="", encoding="utf-8") as f:
+            return self._ingest_chunks(_csv_chunks(csv.DictReader(f), symbol))
+
+    def ingest_parquet(self, path: str, symbol: Optional[str] = None) -> Dict[str, int]:
+        """Ingest a Parquet file with date, close and optional symbol columns"""
+        import pandas as pd  # optional: also needs pyarrow or fastparquet
+
+        frame = pd.read_parquet(path)
+        symbols = frame["symbol"].astype(str) if symbol is None else [symbol] * len(frame)
+        rows = zip(frame["date"].astype(str).str[:10], frame["close"].astype(float), symbols)
+        return self._ingest_chunks(_group_rows(list(rows)))
+
+    def _ingest_chunks(self, chunks: Iterator[Dict[str, Tuple[list, list]]]) -> Dict[str, int]:
+        added: Dict[str, int] = {}
+        for chunk in chunks:
+            for name, (dates, closes) in chunk.items():
+                added[name] = added.get(name, 0) + self.append(name, dates, closes)
+        return added
+
+
+def _group_rows(rows: List[Tuple[str, float, str]]) -> Dict[str, Tuple[list, list]]:
+    """Group (date, close, symbol) rows into per-symbol columns"""
+    grouped: Dict[str, Tuple[list, list]] = {}
+    for date, close, name in rows:
+        dates, closes = grouped.setdefault(name, ([], []))
+        dates.append(date)
+        closes.append(close)
+    return grouped
+
+
+def _csv_chunks(reader: csv.DictReader, symbol: Optional[str]) -> Iterator[Dict[str, Tuple[list, list]]]:
+    """Yield CSV rows in bounded chunks grouped by symbol"""
+    rows = []
+    for record in reader:
+        rows.append((record["date"][:10], float(record["close"]), symbol or record["symbol"]))
+        if len(rows) >= INGEST_CHUNK_ROWS:
+            yield _group_rows(rows)
+            rows = []
+    if rows:
+        yield _group_rows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local price store")
+    parser.add_argument("root", help="price store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="append prices from a CSV or Parquet file")
+    ingest.add_argument("file")
+    ingest.add_argument("--symbol", help="symbol for files without a symbol column")
+    stats = commands.add_parser("stats", help="show return statistics for a symbol")
+    stats.add_argument("symbol")
+    stats.add_argument("--window", type=int, help="number of most recent daily returns")
+    args = parser.parse_args()
+
+    store = PriceStore(args.root)
+    if args.command == "ingest":
+        if args.file.endswith(".parquet"):
+            added = store.ingest_parquet(args.file, args.symbol)
+        else:
+            added = store.ingest_csv(args.file, args.symbol)
+        for name, count in sorted(added.items()):
+            print(f"{name}: {count} rows added")
+    else:
+        count, mean, std = store.window_stats(args.symbol, args.window)
+        print(f"{args.symbol}: {count} returns, mean {mean:.6f}, std {std:.6f}")
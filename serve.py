@@ -0,0 +1,268 @@
+"""Production launcher: pre-forked uvicorn workers sharing one socket
+
+    python serve.py --workers 4 --port 8000
+
+The launcher imports the app, compiles the category rules and computes the
+predictor statistics (``main.warm_up(start_pool=False)``), binds the
+listening socket and only then forks the workers, so the preloaded state is
+shared copy-on-write. Each worker runs its own event loop, prediction pool
+and SQLite connections and shares nothing else with its siblings; the
+kernel spreads incoming connections across them. Workers that exit
+unexpectedly are replaced.
+
+Signals:
+
+    SIGHUP     graceful reload: re-read the rules and price statistics, start
+               a new generation of workers and retire the old one once every
+               new worker is ready (in-flight requests are finished)
+    SIGTTIN    one worker more
+    SIGTTOU    one worker fewer
+    SIGTERM    graceful shutdown (also SIGINT)
+
+Code changes need a restart; SIGHUP reloads data and configuration files.
+"""
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+import uvicorn
+
+logger = logging.getLogger("finvoice.serve")
+
+# Seconds a new generation of workers gets to become ready on reload
+READY_TIMEOUT = 60.0
+
+# Seconds workers get to finish in-flight requests on shutdown
+GRACEFUL_TIMEOUT = 30.0
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server that reports to the launcher once the app is warm"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        # The lifespan handler (and with it warm_up) has run when this returns
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Import the app and build everything workers can share before fork"""
+    import main
+
+    main.warm_up(start_pool=False)
+    return main
+
+
+class Launcher:
+    """Forks and supervises a generation of identical workers"""
+
+    def __init__(self, sock: socket.socket, workers: int, log_level: str = "info"):
+        self.sock = sock
+        self.target = workers
+        self.log_level = log_level
+        self.generation = 0
+        self.children: Dict[int, int] = {}  # pid -> generation
+        self.retiring: Set[int] = set()
+        self.stopping = False
+        self._signals: List[int] = []
+        self._ready_r, self._ready_w = os.pipe()
+        self._next_respawn = 0.0
+
+    def current(self) -> List[int]:
+        return [pid for pid, generation in self.children.items() if generation == self.generation]
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._run_worker()
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+        return pid
+
+    def _run_worker(self) -> int:
+        for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        os.close(self._ready_r)
+
+        import main
+
+        config = uvicorn.Config(main.app, log_level=self.log_level, access_log=False, lifespan="on")
+        server = _WorkerServer(config, self._ready_w)
+        server.run(sockets=[self.sock])
+        return 0 if server.started else 1
+
+    def _drain_ready(self):
+        while select.select([self._ready_r], [], [], 0)[0]:
+            os.read(self._ready_r, 1024)
+
+    def _wait_ready(self, count: int, timeout: float) -> bool:
+        """Wait until ``count`` workers have reported ready"""
+        deadline = time.monotonic() + timeout
+        seen = 0
+        while seen < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if select.select([self._ready_r], [], [], min(remaining, 0.5))[0]:
+                seen += len(os.read(self._ready_r, count - seen))
+            elif not self.current():
+                return False  # the whole generation died during startup
+            self._reap()
+        return True
+
+    def _reap(self):
+        """Collect exited workers and replace those still wanted"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            generation = self.children.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif generation == self.generation and not self.stopping:
+                logger.warning("Worker %d exited unexpectedly (wait status %d)", pid, status)
+
+        # Replace unexpected exits, at most once a second to avoid a crash loop
+        if not self.stopping and len(self.current()) < self.target and time.monotonic() >= self._next_respawn:
+            self._next_respawn = time.monotonic() + 1.0
+            while len(self.current()) < self.target:
+                self.spawn()
+
+    def start(self):
+        self._drain_ready()
+        for _ in range(self.target):
+            self.spawn()
+        if self._wait_ready(self.target, READY_TIMEOUT):
+            logger.info("%d workers ready on %s", self.target, self.sock.getsockname())
+
+    def reload(self):
+        """Refresh the shared state and roll to a new generation of workers"""
+        logger.info("Reloading: refreshing rules and price statistics")
+        main = sys.modules["main"]
+        main.categorizer.engine.reload(force=True)
+        main.predictor = None  # recomputed from the price store by warm_up
+        main.warm_up(start_pool=False)
+
+        old = self.current()
+        self.generation += 1
+        self._drain_ready()
+        for _ in range(self.target):
+            self.spawn()
+        if self._wait_ready(self.target, READY_TIMEOUT):
+            for pid in old:
+                self._kill(pid, signal.SIGTERM)
+            logger.info("Reload complete, retired %d workers", len(old))
+        else:
+            logger.error("New workers did not become ready, keeping the previous generation")
+            for pid in self.current():
+                self._kill(pid, signal.SIGKILL)
+            self.generation -= 1
+
+    def scale(self, delta: int):
+        self.target = max(1, self.target + delta)
+        workers = self.current()
+        if len(workers) > self.target:
+            self.retiring.add(workers[-1])
+            self.children[workers[-1]] = -1  # no longer counted or replaced
+            self._kill(workers[-1], signal.SIGTERM)
+        logger.info("Scaling to %d workers", self.target)
+        self._reap()
+
+    def stop(self):
+        """Let every worker finish its in-flight requests, then exit"""
+        self.stopping = True
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGKILL)
+        self._reap()
+
+    @staticmethod
+    def _kill(pid: int, sig: int):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def run(self):
+        for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._on_signal)
+        self.start()
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self.stop()
+                    return
+                if signum == signal.SIGHUP:
+                    self.reload()
+                elif signum == signal.SIGTTIN:
+                    self.scale(1)
+                elif signum == signal.SIGTTOU:
+                    self.scale(-1)
+            self._reap()
+            time.sleep(0.1)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the FinVoice ML service with pre-forked workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", "0")) or os.cpu_count() or 1,
+                        help="worker processes (default: WEB_WORKERS or the core count)")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    if not hasattr(os, "fork"):
+        # No fork (Windows): a single uvicorn process is the best we can do
+        logger.warning("os.fork is unavailable, running a single worker")
+        uvicorn.run("main:app", host=args.host, port=args.port, log_level=args.log_level)
+        return 0
+
+    # Each web worker already owns a core, so its prediction pool stays small
+    os.environ.setdefault("PREDICTION_WORKERS", "1")
+    sock = bind_socket(args.host, args.port)
+    preload()
+    Launcher(sock, args.workers, args.log_level).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
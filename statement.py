@@ -0,0 +1,412 @@
+"""Incremental bank statement parsing for CSV and OFX uploads
+
+StatementReader takes an uploaded statement in byte chunks of any size
+and returns each transaction as soon as its row is complete, so a
+statement of any length is parsed in constant memory. CSV columns are
+found by header name (a date, a description or narration, and an amount
+or debit/credit pair), after any preamble lines banks put above the
+header. OFX transactions are read from their <STMTTRN> blocks. Rows that
+cannot be read come back as {"line": n, "error": ...} instead of failing
+the import. MultipartFileReader pulls the file part out of a
+multipart/form-data body, also chunk by chunk, and StatementImport ties
+both to a categorizer and writes the NDJSON answer.
+"""
+import codecs
+import csv
+import html
+import re
+from datetime import date, datetime
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+from codec import dumps
+
+FORMATS = ("csv", "ofx")
+
+# Header names (lowercased, dots dropped) recognized for each CSV column
+DATE_COLUMNS = ("date", "transaction date", "txn date", "tran date", "posting date", "posted date", "value date")
+DESCRIPTION_COLUMNS = ("description", "narration", "transaction details", "details", "particulars", "payee",
+                       "name", "memo", "remarks")
+AMOUNT_COLUMNS = ("amount", "transaction amount", "amount (inr)")
+DEBIT_COLUMNS = ("debit", "debit amount", "withdrawal", "withdrawals", "withdrawal amt", "withdrawal amount")
+CREDIT_COLUMNS = ("credit", "credit amount", "deposit", "deposits", "deposit amt", "deposit amount")
+TYPE_COLUMNS = ("type", "transaction type", "dr/cr", "cr/dr")
+
+# Lines above the header (account number, period, ...) skipped before giving up
+MAX_PREAMBLE_LINES = 50
+
+# Longest CSV record or OFX transaction buffered while waiting for its end
+MAX_RECORD_CHARS = 64 * 1024
+
+# Day-first formats are tried before month-first ones, so 03/04/2024 is 3 April
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%d-%b-%Y", "%d %b %Y",
+                "%d-%b-%y", "%d %b %y", "%b %d, %Y", "%m/%d/%Y", "%Y/%m/%d", "%Y%m%d")
+
+# Distinct date strings remembered per statement; statements repeat few dates
+DATE_CACHE_SIZE = 4096
+
+_AMOUNT_NOISE = str.maketrans("", "", ",₹$ ")
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+class StatementError(ValueError):
+    """The upload cannot be read as a statement at all"""
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """Signed amount (negative for money out) from a statement cell, None when blank
+
+    Accepts thousands separators, currency symbols, "(12.50)" and a trailing
+    "Dr"/"Cr". Raises ValueError for anything else.
+    """
+    if not text:
+        return None
+    try:
+        return float(text)  # most cells are plain numbers
+    except ValueError:
+        pass
+    original = text = text.strip()
+    if not text:
+        return None
+    sign = 1.0
+    suffix = text[-2:].lower()
+    if suffix in ("dr", "cr"):
+        sign = -1.0 if suffix == "dr" else 1.0
+        text = text[:-2]
+    if text.startswith("(") and text.endswith(")"):
+        sign, text = -sign, text[1:-1]
+    text = text.translate(_AMOUNT_NOISE)
+    if text[:3].lower() == "inr":
+        text = text[3:]
+    elif text[:3].lower() == "rs.":
+        text = text[3:]
+    try:
+        return sign * float(text)
+    except ValueError:
+        raise ValueError(f"invalid amount {original!r}") from None
+
+
+def _header_name(cell: str) -> str:
+    return " ".join(cell.lower().replace(".", " ").split())
+
+
+def _find(header: List[str], names) -> Optional[int]:
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+class StatementReader:
+    """Normalized transactions from a CSV or OFX statement fed in byte chunks
+
+    Every transaction is a dict with the statement ``line`` it starts on, an
+    ISO ``date``, the ``description``, a positive ``amount`` and ``type``
+    ("debit" for money out, "credit" for money in). The format is taken from
+    the first bytes unless given.
+    """
+
+    def __init__(self, statement_format: Optional[str] = None):
+        if statement_format is not None and statement_format not in FORMATS:
+            raise StatementError(f"format must be one of {', '.join(FORMATS)}")
+        self.format = statement_format
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._pending = ""
+        self._line = 0  # lines consumed before self._pending
+        self._columns: Optional[Dict[str, Optional[int]]] = None
+        self._dates: Dict[str, str] = {}
+        self._date_format: Optional[str] = None
+
+    def feed(self, data: bytes) -> List[Dict]:
+        """Add a chunk of the file; returns the rows it completed"""
+        return self._feed(self._pending + self._decoder.decode(data), final=False)
+
+    def finish(self) -> List[Dict]:
+        """Return the last rows once the whole file has been fed"""
+        text = self._pending + self._decoder.decode(b"", final=True)
+        # A last CSV line without a newline is complete now
+        rows = self._feed(text + "\n" if text.strip() and self.format != "ofx" else text, final=True)
+        if self.format == "csv" and self._pending:
+            raise StatementError(f"quoted field on line {self._line + 1} never ends")
+        if self.format == "csv" and self._columns is None:
+            raise StatementError("no header row with date, description and amount columns")
+        return rows
+
+    def _feed(self, text: str, final: bool) -> List[Dict]:
+        if self.format is None:
+            head = text.lstrip()[:9].upper()
+            if len(head) < 9 and not final:
+                self._pending = text
+                return []
+            self.format = "ofx" if head.startswith(("OFXHEADER", "<OFX", "<?XML")) else "csv"
+        if self.format == "ofx":
+            return self._feed_ofx(text)
+        try:
+            return self._feed_csv(text)
+        except csv.Error as e:
+            raise StatementError(f"unreadable CSV: {e}") from None
+
+    def _feed_csv(self, text: str) -> List[Dict]:
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        if len(self._pending) > MAX_RECORD_CHARS:
+            raise StatementError(f"line {self._line + len(lines) + 1} is longer than {MAX_RECORD_CHARS} characters")
+        # Group physical lines into records; a quoted field may span lines
+        records, numbers = [], []
+        open_start = None  # offset of the line an unfinished quoted record starts on
+        for offset, line in enumerate(lines):
+            if open_start is None:
+                numbers.append(self._line + offset + 1)
+                if line.count('"') % 2:
+                    open_start = offset
+                else:
+                    records.append(line.rstrip("\r"))
+            elif line.count('"') % 2:
+                records.append("\n".join(lines[open_start:offset + 1]).rstrip("\r"))
+                open_start = None
+        if open_start is not None:
+            # Keep the unfinished record for the next chunk
+            numbers.pop()
+            self._pending = "\n".join(lines[open_start:] + [self._pending])
+            if len(self._pending) > MAX_RECORD_CHARS:
+                raise StatementError(f"quoted field on line {self._line + open_start + 1} never ends")
+            self._line += open_start
+        else:
+            self._line += len(lines)
+        return [row for row in map(self._csv_row, numbers, csv.reader(records)) if row is not None]
+
+    def _csv_row(self, number: int, cells: List[str]) -> Optional[Dict]:
+        if not any(cells) or not "".join(cells).strip():
+            return None  # blank line
+        columns = self._columns
+        if columns is None:
+            self._read_header(number, cells)
+            return None
+        try:
+            if columns["amount"] is not None:
+                amount = parse_amount(cells[columns["amount"]])
+                if amount is None:
+                    raise ValueError("missing amount")
+                if columns["type"] is not None:
+                    kind = cells[columns["type"]].strip().lower()
+                    if kind.startswith(("d", "w")):
+                        amount = -abs(amount)
+                    elif kind.startswith("c"):
+                        amount = abs(amount)
+            else:
+                debit = parse_amount(cells[columns["debit"]]) if columns["debit"] is not None else None
+                credit = parse_amount(cells[columns["credit"]]) if columns["credit"] is not None else None
+                if debit is None and credit is None:
+                    raise ValueError("missing debit and credit amounts")
+                amount = abs(credit or 0.0) - abs(debit or 0.0)
+            return self._row(number, self._date(cells[columns["date"]]),
+                             cells[columns["description"]], amount)
+        except IndexError:
+            return {"line": number, "error": f"expected {len(self._header)} columns, got {len(cells)}"}
+        except ValueError as e:
+            return {"line": number, "error": str(e)}
+
+    def _read_header(self, number: int, cells: List[str]):
+        header = [_header_name(cell) for cell in cells]
+        columns = {
+            "date": _find(header, DATE_COLUMNS),
+            "description": _find(header, DESCRIPTION_COLUMNS),
+            "amount": _find(header, AMOUNT_COLUMNS),
+            "debit": _find(header, DEBIT_COLUMNS),
+            "credit": _find(header, CREDIT_COLUMNS),
+            "type": _find(header, TYPE_COLUMNS),
+        }
+        has_amount = columns["amount"] is not None or columns["debit"] is not None or columns["credit"] is not None
+        if columns["date"] is not None and columns["description"] is not None and has_amount:
+            self._columns = columns
+            self._header = header
+        elif number > MAX_PREAMBLE_LINES:
+            raise StatementError("no header row with date, description and amount columns")
+
+    def _feed_ofx(self, text: str) -> List[Dict]:
+        rows = []
+        end = 0
+        for match in _OFX_TRANSACTION.finditer(text):
+            self._line += text.count("\n", end, match.start())
+            rows.append(self._ofx_row(self._line + 1, match.group(1)))
+            self._line += match.group(0).count("\n")
+            end = match.end()
+        rest = text[end:]
+        # Only an unfinished transaction is worth keeping
+        start = rest.upper().rfind("<STMTTRN>")
+        keep = len(rest) - start if start >= 0 else min(len(rest), len("<STMTTRN>"))
+        self._line += rest.count("\n", 0, len(rest) - keep)
+        self._pending = rest[len(rest) - keep:]
+        if len(self._pending) > MAX_RECORD_CHARS:
+            raise StatementError(f"transaction on line {self._line + 1} never ends")
+        return rows
+
+    def _ofx_row(self, number: int, block: str) -> Dict:
+        fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(block)}
+        try:
+            if not fields.get("TRNAMT"):
+                raise ValueError("missing TRNAMT")
+            if not fields.get("DTPOSTED"):
+                raise ValueError("missing DTPOSTED")
+            description = html.unescape(fields.get("NAME") or fields.get("MEMO") or "")
+            return self._row(number, self._date(fields["DTPOSTED"][:8]), description, parse_amount(fields["TRNAMT"]))
+        except ValueError as e:
+            return {"line": number, "error": str(e)}
+
+    def _row(self, number: int, day: str, description: str, amount: float) -> Dict:
+        return {
+            "line": number,
+            "date": day,
+            # The keyword matcher needs descriptions without newlines
+            "description": " ".join(description.split()) if "\n" in description else description.strip(),
+            "amount": round(abs(amount), 2),
+            "type": "debit" if amount < 0 else "credit",
+        }
+
+    def _date(self, text: str) -> str:
+        text = text.strip()
+        cached = self._dates.get(text)
+        if cached is not None:
+            return cached
+        if len(self._dates) >= DATE_CACHE_SIZE:
+            self._dates.clear()
+        parsed = None
+        try:
+            parsed = date.fromisoformat(text[:10])
+        except ValueError:
+            # The format that worked last is almost always the statement's format
+            formats = DATE_FORMATS if self._date_format is None else (self._date_format,) + DATE_FORMATS
+            for candidate in formats:
+                try:
+                    parsed = datetime.strptime(text, candidate).date()
+                except ValueError:
+                    continue
+                self._date_format = candidate
+                break
+        if parsed is None:
+            raise ValueError(f"invalid date {text!r}")
+        self._dates[text] = parsed.isoformat()
+        return self._dates[text]
+
+
+class MultipartFileReader:
+    """The first file part of a multipart/form-data body, fed in chunks"""
+
+    def __init__(self, content_type: str):
+        _, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise StatementError("multipart body without a boundary")
+        self.filename: Optional[str] = None
+        self._data: List[bytes] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._in_file = False
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Add a chunk of the body; returns the file bytes it contained"""
+        self._parser.write(chunk)
+        data = b"".join(self._data)
+        self._data.clear()
+        return data
+
+    def finish(self):
+        self._parser.finalize()
+        if self.filename is None:
+            raise StatementError("no file part in the upload")
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self.filename is None and b"filename" in options:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._data.append(data[start:end])
+
+    def _on_part_end(self):
+        self._in_file = False
+
+
+class StatementImport:
+    """Categorized NDJSON answer to a statement upload, written to ``out``
+
+    Rows are categorized ``batch_size`` at a time with ``categorize_many``
+    and written as they are; per-category debit totals are kept along the
+    way and written as the last line by ``finish``.
+    """
+
+    def __init__(self, reader: StatementReader, upload: Optional[MultipartFileReader],
+                 categorize_many: Callable[[List[str]], List[str]], out: BinaryIO, batch_size: int = 1000):
+        self.reader = reader
+        self.upload = upload
+        self.categorize_many = categorize_many
+        self.out = out
+        self.batch_size = batch_size
+        self.totals: Dict[str, List[float]] = {}
+        self.transactions = 0
+        self.errors = 0
+        self._pending: List[Dict] = []
+
+    def feed(self, chunk: bytes):
+        """Add a chunk of the request body; raises StatementError when it cannot be a statement"""
+        self._pending += self.reader.feed(self.upload.feed(chunk) if self.upload is not None else chunk)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def finish(self):
+        """Write the last rows and the totals line once the body has ended"""
+        if self.upload is not None:
+            self.upload.finish()
+        self._pending += self.reader.finish()
+        self._flush()
+        self.out.write(dumps({
+            "totals": [{"category": category, "amount": round(amount, 2), "count": count}
+                       for category, (amount, count) in self.totals.items()],
+            "transactions": self.transactions,
+            "errors": self.errors,
+            "format": self.reader.format
+        }) + b"\n")
+
+    def _flush(self):
+        rows, self._pending = self._pending, []
+        transactions = [row for row in rows if "error" not in row]
+        self.transactions += len(transactions)
+        self.errors += len(rows) - len(transactions)
+        categories = self.categorize_many([row["description"] for row in transactions])
+        for row, category in zip(transactions, categories):
+            row["category"] = category
+            if row["type"] == "debit":
+                total = self.totals.get(category)
+                if total is None:
+                    total = self.totals[category] = [0.0, 0]
+                total[0] += row["amount"]
+                total[1] += 1
+        self.out.write(b"".join(dumps(row) + b"\n" for row in rows))
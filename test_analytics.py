@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+import pytest
+
+from spending import CategoryAggregator, MAX_HISTORY_DAYS, MAX_TREND_CATEGORIES, aggregate_by_category
+
+
+def history():
+    """Daily food spending that doubles in April, weekly travel with one big trip"""
+    expenses = []
+    day = date(2024, 1, 1)
+    while day <= date(2024, 4, 10):
+        expenses.append({"category": "food", "amount": 100 if day.month < 4 else 200, "date": day.isoformat()})
+        if day.weekday() == 0:
+            expenses.append({"category": "travel", "amount": 50, "date": day.isoformat()})
+        day += timedelta(days=1)
+    expenses.append({"category": "travel", "amount": 2000, "date": "2024-03-13T18:30:00"})
+    expenses.append({"category": "misc", "amount": 5})
+    return expenses
+
+
+def test_monthly_trends_use_complete_months():
+    trends = aggregate_by_category(history()).trends()
+    assert (trends["start"], trends["end"], trends["last_month"]) == ("2024-01-01", "2024-04-10", "2024-03")
+    assert trends["months"] == 4 and trends["weeks"] == 15
+    food, travel, misc = trends["categories"]
+    assert food == {"category": "food", "last_month": 3100.0, "previous_month": 2900.0, "month_over_month": 7,
+                    "rolling_average": 3000.0, "vs_average": 3, "month_to_date": 2000.0, "daily_average": 133.33}
+    assert (travel["last_month"], travel["rolling_average"], travel["vs_average"]) == (2200.0, 225.0, 878)
+    # Undated expenses count towards the totals but not the trends
+    assert misc["last_month"] == 0 and misc["month_over_month"] is None
+
+
+def test_weekly_spikes():
+    spikes = aggregate_by_category(history()).trends()["spikes"]
+    assert [(s["category"], s["week"], s["amount"]) for s in spikes] == [
+        ("food", "2024-04-01", 1400.0), ("travel", "2024-03-11", 2050.0)]
+    assert all(s["z_score"] >= 3 for s in spikes)
+
+
+def test_chunked_aggregation_matches_single_pass():
+    expenses = history()
+    chunked = CategoryAggregator()
+    # Later chunks extend the date range backwards and add categories
+    for start in range(len(expenses), 0, -40):
+        chunked.add_expenses(expenses[max(0, start - 40):start])
+    single = aggregate_by_category(expenses).trends()
+    rows = {row["category"]: row for row in chunked.trends()["categories"]}
+    assert rows == {row["category"]: row for row in single["categories"]}
+    assert chunked.trends()["spikes"] == single["spikes"]
+
+
+def test_no_dates_means_no_trends():
+    assert aggregate_by_category([{"category": "food", "amount": 1}]).trends() is None
+
+
+def test_date_span_is_bounded():
+    aggregator = CategoryAggregator()
+    with pytest.raises(ValueError):
+        aggregator.add(["food", "food"], [1, 2], ["0024-01-01", "2024-01-01"])
+    last = date(2024, 1, 1) + timedelta(days=MAX_HISTORY_DAYS - 1)
+    aggregator.add(["food", "food"], [1, 2], ["2024-01-01", last.isoformat()])
+    assert aggregator.trends()["end"] == last.isoformat()
+
+
+def test_unparseable_dates_are_undated():
+    aggregator = CategoryAggregator()
+    aggregator.add(["food", "food", "food"], [1, 2, 4], ["15/01/2024", "2024-01-02", None])
+    assert aggregator.totals() == {"food": 7.0}
+    assert aggregator.trends()["categories"][0]["daily_average"] == 2.0
+
+
+def test_trend_categories_are_capped():
+    aggregator = CategoryAggregator()
+    names = [f"c{i}" for i in range(MAX_TREND_CATEGORIES + 36)]
+    aggregator.add(names[:10], [1.0] * 10, ["2024-01-01"] * 10)
+    aggregator.add(names, [1.0] * len(names), ["2024-01-02"] * len(names))
+    assert len(aggregator.totals()) == len(names)
+    assert aggregator._daily.shape == (MAX_TREND_CATEGORIES, 2)
+    rows = aggregator.trends()["categories"]
+    assert len(rows) == MAX_TREND_CATEGORIES
+    assert (rows[-2]["category"], rows[-2]["daily_average"]) == (names[MAX_TREND_CATEGORIES - 2], 0.5)
+    assert (rows[-1]["category"], rows[-1]["daily_average"]) == ("other", 18.5)
@@ -0,0 +1,40 @@
+import time
+
+from cache import ResponseCache, normalize_text
+
+
+def test_lru_eviction_and_counters():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, 3)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") == (False, None)
+
+
+def test_version_and_normalization_in_keys():
+    cache = ResponseCache()
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_compute("categorize", normalize_text("Add  Coffee 150"), 1, compute) == 1
+    assert cache.get_or_compute("categorize", normalize_text("add coffee 150 "), 1, compute) == 1
+    # A new rules version never sees the old entry
+    assert cache.get_or_compute("categorize", normalize_text("add coffee 150"), 2, compute) == 2
+
+
+def test_shared_store_between_workers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = ResponseCache(shared_path=path), ResponseCache(shared_path=path)
+    first.set("key", {"category": "food"})
+    assert second.get("key") == (True, {"category": "food"})
+    assert second.stats()["shared_hits"] == 1
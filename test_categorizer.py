@@ -0,0 +1,90 @@
+import json
+import os
+
+from categorizer import ExpenseCategorizer, KeywordMatcher
+
+
+def naive_categorize(categories, description):
+    """Reference implementation: the original nested keyword loop"""
+    description = description.lower()
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword in description:
+                return category
+    return "misc"
+
+
+SAMPLES = [
+    "dinner at restaurant",
+    "uber ride",
+    "netflix subscription",
+    "amazon purchase",
+    "doctor visit",
+    "gameal",  # overlapping keywords: "game" (entertainment) and "meal" (food)
+    "car rental at the mall",
+    "Showtime Tickets",
+    "gym membership and online course",
+    "something unknown",
+    "",
+]
+
+
+def test_matcher_matches_nested_loop():
+    categorizer = ExpenseCategorizer()
+    for text in SAMPLES:
+        assert categorizer.categorize(text) == naive_categorize(categorizer.categories, text), text
+
+
+def test_match_many_preserves_order():
+    categorizer = ExpenseCategorizer()
+    expected = [naive_categorize(categorizer.categories, text) for text in SAMPLES]
+    assert categorizer.categorize_many(SAMPLES) == expected
+
+
+def test_empty_rules_fall_back_to_default():
+    matcher = KeywordMatcher({"misc": []})
+    assert matcher.match("coffee") == "misc"
+    assert matcher.match_many(["coffee", "taxi"]) == ["misc", "misc"]
+
+
+def write_rules(path, categories, mtime_ns):
+    path.write_text(json.dumps(categories))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_rules_hot_reload(tmp_path):
+    rules = tmp_path / "rules.json"
+    write_rules(rules, {"food": ["coffee"], "misc": []}, 1_000_000_000)
+    categorizer = ExpenseCategorizer(str(rules))
+    categorizer.engine.check_interval = 0
+    before = categorizer.engine.current()
+    assert categorizer.categorize("coffee beans") == "food"
+    assert categorizer.categorize("chai") == "misc"
+
+    write_rules(rules, {"drinks": ["chai", "coffee"], "misc": []}, 2_000_000_000)
+    assert categorizer.categorize("chai") == "drinks"
+    # A snapshot taken before the reload is left untouched
+    assert before.matcher.match("chai") == "misc"
+
+
+def test_invalid_rules_keep_previous_version(tmp_path):
+    rules = tmp_path / "rules.json"
+    write_rules(rules, {"food": ["coffee"], "misc": []}, 1_000_000_000)
+    categorizer = ExpenseCategorizer(str(rules))
+    categorizer.engine.check_interval = 0
+
+    rules.write_text("{not json")
+    os.utime(rules, ns=(2_000_000_000, 2_000_000_000))
+    assert categorizer.categorize("coffee") == "food"
+
+
+def test_invalid_keywords_keep_previous_version(tmp_path):
+    rules = tmp_path / "rules.json"
+    write_rules(rules, {"food": ["coffee"], "misc": []}, 1_000_000_000)
+    categorizer = ExpenseCategorizer(str(rules))
+    categorizer.engine.check_interval = 0
+
+    for version, keywords in enumerate((["coffee", 1], ["coffee", ""], ["coffee", "a\nb"]), start=2):
+        write_rules(rules, {"food": keywords, "misc": []}, version * 1_000_000_000)
+        assert categorizer.categorize("coffee") == "food"
+        assert categorizer.version[0] == 1_000_000_000
@@ -0,0 +1,84 @@
+import numpy as np
+
+from categorizer import ExpenseCategorizer
+from category_model import CategoryModel, LazyCategoryModel, hash_ngrams, read_labelled_csv
+
+TRAINING = {
+    "travel": ["uber to office", "ola cab ride", "metro card recharge", "flight to delhi", "train tickets"],
+    "food": ["dinner with friends", "lunch at cafe", "pizza delivery", "breakfast buffet", "swiggy order"],
+    "health": ["pharmacy medicines", "dentist checkup", "blood test lab", "doctor consultation", "vitamins"],
+}
+
+
+def training_data():
+    texts, labels = [], []
+    for label, examples in TRAINING.items():
+        for example in examples:
+            for prefix in ("", "paid for ", "monthly "):
+                texts.append(prefix + example)
+                labels.append(label)
+    return texts, labels
+
+
+def test_batch_hashing_matches_per_text():
+    texts = ["uber ride", "", "Dinner  at CAFE", "₹ coffee"]
+    features, counts = hash_ngrams(texts, 1024, (2, 3))
+    bounds = np.cumsum(counts)
+    for text, start, end in zip(texts, bounds - counts, bounds):
+        alone, count = hash_ngrams([text], 1024, (2, 3))
+        assert count.tolist() == [end - start]
+        assert sorted(features[start:end].tolist()) == sorted(alone.tolist())
+
+
+def test_nul_bytes_do_not_shift_text_boundaries():
+    texts, labels = training_data()
+    model = CategoryModel.train(texts, labels, buckets=4096)
+    predicted, confidence = model.predict(["uber\x00ride", "lunch at cafe", "dentist checkup"])
+    assert predicted[1:] == ["food", "health"]
+    assert len(confidence) == 3
+    assert hash_ngrams(["uber\x00ride"], 1024, (2, 3))[0].tolist() == hash_ngrams(["uber ride"], 1024, (2, 3))[0].tolist()
+
+
+def test_train_save_and_mmap_load(tmp_path):
+    texts, labels = training_data()
+    model = CategoryModel.train(texts, labels, buckets=4096)
+    predicted, confidence = model.predict(texts)
+    assert predicted == labels
+    assert model.predict(["uber to airport"])[0] == ["travel"]
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = CategoryModel.load(path)
+    assert isinstance(loaded.weights, np.memmap)
+    assert loaded.classes == model.classes
+    assert loaded.predict(texts)[0] == labels
+    np.testing.assert_allclose(loaded.predict(texts)[1], confidence, atol=1e-2)
+
+
+def test_categorizer_falls_back_to_rules(tmp_path):
+    texts, labels = training_data()
+    path = str(tmp_path / "model.npz")
+    CategoryModel.train(texts, labels, buckets=4096).save(path)
+
+    categorizer = ExpenseCategorizer(model_path=path, min_confidence=0.6)
+    # The model knows nothing about subscriptions, so the rules decide
+    rules_only = ExpenseCategorizer().categorize("netflix subscription")
+    assert rules_only not in TRAINING
+    assert categorizer.categorize_many(["ola cab ride", "netflix subscription"]) == ["travel", rules_only]
+    assert categorizer.categorize("dentist checkup") == "health"
+    assert categorizer.version[1] > 0
+
+
+def test_lazy_model_loads_on_first_use(tmp_path):
+    texts, labels = training_data()
+    path = str(tmp_path / "model.npz")
+    lazy = LazyCategoryModel(path)
+    CategoryModel.train(texts, labels, buckets=4096).save(path)
+    assert lazy._model is None
+    assert lazy.predict(["pizza delivery"]) == ["food"]
+
+
+def test_read_labelled_csv(tmp_path):
+    path = tmp_path / "labelled.csv"
+    path.write_text("description,category\nuber ride,Travel\n,food\ncoffee,food\n")
+    assert read_labelled_csv(str(path)) == (["uber ride", "coffee"], ["travel", "food"])
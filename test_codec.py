@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+import pytest
+
+import codec
+
+
+def test_dumps_is_compact_json():
+    value = {"text": "₹300 chai", "amounts": [1.5, 2], "nested": {"ok": True, "none": None}}
+    encoded = codec.dumps(value)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == value
+    assert b", " not in encoded
+    assert codec.loads(encoded) == codec.loads(encoded.decode()) == value
+
+
+@pytest.mark.skipif(codec.orjson is None, reason="orjson is not installed")
+def test_dumps_accepts_numpy_values():
+    assert json.loads(codec.dumps({"total": np.float64(2.5), "values": np.arange(3)})) == {
+        "total": 2.5, "values": [0, 1, 2]}
+
+
+def test_stdlib_fallback_matches(monkeypatch):
+    value = {"description": "café", "amount": 12.5, "category": None}
+    fast = codec.dumps(value)
+    monkeypatch.setattr(codec, "orjson", None)
+    assert codec.dumps(value) == fast
+    assert codec.loads(fast) == value
+
+
+def test_line_splitter_joins_lines_across_chunks():
+    splitter = codec.LineSplitter(max_line_bytes=10)
+    assert splitter.feed(b"ab") == []
+    assert splitter.feed(b"c\nde") == [b"abc"]
+    assert splitter.feed(b"f\n\ng\nh") == [b"def", b"", b"g"]
+    assert splitter.finish() == [b"h"]
+    assert splitter.finish() == []
+    with pytest.raises(ValueError, match="longer than 10 bytes"):
+        for _ in range(6):
+            splitter.feed(b"xy")
+    with pytest.raises(ValueError, match="longer than 10 bytes"):
+        codec.LineSplitter(max_line_bytes=10).feed(b"ok\n" + b"x" * 11 + b"\nok")
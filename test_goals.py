@@ -0,0 +1,72 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from goals import category_cuts, months_between, months_to_target, project_goals, required_deposit
+
+TODAY = date(2026, 1, 15)
+RETURNS = {"savings": 0.0, "stocks": 0.12}
+
+
+def test_required_deposit_round_trips_months_to_target():
+    rates = np.array([0.0, 0.004, 0.01])
+    deposit = required_deposit(12000, 1000, 24, rates)
+    assert deposit[0] == pytest.approx(11000 / 24)
+    assert months_to_target(12000, 1000, deposit, rates).tolist() == [24, 24, 24]
+    # A passed deadline needs the whole shortfall now; a met target needs nothing
+    assert required_deposit(5000, 1000, 0, 0.01) == 4000
+    assert required_deposit(5000, 6000, 12, 0.01) == 0
+
+
+def test_unreachable_goals_never_complete():
+    months = months_to_target(1000, 0, np.array([0.0, 10.0]), 0.0)
+    assert months.tolist() == [np.inf, 100]
+    assert months_between(date(2026, 1, 15), date(2026, 3, 14)) == 1
+    assert months_between(date(2026, 1, 15), date(2025, 1, 1)) == 0
+
+
+def test_category_cuts_cover_the_gap_largest_first():
+    spending = {"food": 1000.0, "travel": 500.0, "bills": 3000.0, "shopping": 200.0}
+    assert category_cuts(spending, 400) == ([
+        {"category": "food", "cut": 300.0, "new_budget": 700.0},
+        {"category": "travel", "cut": 100.0, "new_budget": 400.0},
+    ], 0.0)
+    # Essentials are never cut, so a large gap leaves a shortfall
+    cuts, shortfall = category_cuts(spending, 1000)
+    assert [cut["category"] for cut in cuts] == ["food", "travel", "shopping"]
+    assert shortfall == 490.0
+    assert category_cuts(spending, 0) == ([], 0.0)
+
+
+def test_project_goals_funds_deadlines_first():
+    goals = [
+        {"name": "laptop", "target_amount": 1200.0, "saved": 0.0, "deadline": date(2027, 1, 15)},
+        {"name": "house", "target_amount": 10000.0, "saved": 1000.0, "investment_type": "stocks"},
+    ]
+    plan = project_goals(goals, {"food": 1000.0}, 150.0, RETURNS, today=TODAY)
+    assert (plan["required_monthly_savings"], plan["gap"], plan["cuts"]) == (100.0, 0.0, [])
+    laptop, house = plan["goals"]
+    assert (laptop["required_monthly_savings"], laptop["monthly_contribution"]) == (100.0, 100.0)
+    assert (laptop["projected_completion"], laptop["on_track"]) == ("2027-01", True)
+    assert (house["deadline"], house["expected_return"], house["monthly_contribution"]) == (None, 0.12, 50.0)
+    assert house["on_track"] and house["projected_completion"] > "2030"
+
+
+def test_project_goals_scenarios():
+    goals = [{"name": "trip", "target_amount": 2400.0, "deadline": date(2027, 1, 15)}]
+    scenarios = [
+        {"name": "frugal", "spending_cut": 0.1},
+        {"monthly_savings": 0.0},
+        {"name": "boost", "monthly_savings": 100.0, "extra_savings": 300.0},
+    ]
+    plan = project_goals(goals, {"food": 1000.0, "bills": 500.0}, 100.0, RETURNS, scenarios, today=TODAY)
+    assert plan["gap"] == 100.0
+    assert plan["cuts"] == [{"category": "food", "cut": 100.0, "new_budget": 900.0}]
+    assert [(s["name"], s["monthly_savings"], s["projected_completion"], s["goals_on_track"])
+            for s in plan["scenarios"]] == [
+        ("current", 100.0, ["2028-01"], 0),
+        ("frugal", 200.0, ["2027-01"], 1),
+        ("scenario 2", 0.0, [None], 0),
+        ("boost", 400.0, ["2026-07"], 1),
+    ]
@@ -0,0 +1,374 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from ledger import ExpenseLedger
+from offload import PredictionOffloader
+from main import app
+
+client = TestClient(app)
+
+
+def test_categorize_batch_matches_single_endpoint():
+    texts = ["add dinner 300", "uber 150", "netflix subscription 199", "random thing"]
+    response = client.post("/categorize/batch", json={"texts": texts})
+    assert response.status_code == 200
+    expected = [client.post("/categorize", json={"text": text}).json() for text in texts]
+    assert response.json()["results"] == expected
+
+
+def test_categorize_batch_ndjson_stream():
+    texts = ["add coffee %d" % i for i in range(2500)] + ["taxi 200"]
+    body = "\n".join(json.dumps({"text": text}) for text in texts)
+    response = client.post("/categorize/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert len(results) == len(texts)
+    assert results[0]["category"] == "food"
+    assert results[-1] == {"description": "taxi", "amount": 200.0, "category": "travel"}
+
+
+def test_categorize_batch_ndjson_reports_bad_lines():
+    body = '"add coffee 150"\n{not json\n\n{"text": ["x"]}\n{"text": "taxi 200"}'
+    response = client.post("/categorize/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result.get("line") for result in results] == [None, 2, 4, None]
+    assert "error" in results[1] and "error" in results[2]
+    assert results[0]["category"] == "food"
+    assert results[3]["category"] == "travel"
+
+    too_long = client.post("/categorize/batch", content='"add coffee 150"\n"' + "x" * 70000 + '"',
+                           headers={"content-type": "application/x-ndjson"})
+    assert too_long.status_code == 400
+
+
+def test_categorize_batch_rejects_invalid_body():
+    response = client.post("/categorize/batch", json={"texts": "not a list"})
+    assert response.status_code == 422
+
+
+def test_predict_investment_batch_endpoint():
+    response = client.post("/predict-investment/batch", json={
+        "investment_amounts": [50000, 10000],
+        "investment_types": ["stocks", "gold"],
+        "seed": 7,
+    })
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert [p["timeframe"] for p in predictions] == ["1 year", "1 year"]
+    assert predictions[1]["market_sentiment"] == "Stable"
+
+    mismatched = client.post("/predict-investment/batch", json={
+        "investment_amounts": [1, 2], "investment_types": ["stocks"]})
+    assert mismatched.status_code == 400
+
+
+def test_negative_seed_is_rejected():
+    for path, body in (("/predict-investment", {"investment_amount": 1000, "investment_type": "stocks"}),
+                       ("/simulate-investment", {"investment_amount": 1000, "investment_type": "gold"}),
+                       ("/predict-investment/batch", {"investment_amounts": [1], "investment_types": ["gold"]})):
+        assert client.post(path, json=dict(body, seed=-1)).status_code == 422
+
+
+def test_shared_cache_lookups_run_off_the_event_loop(tmp_path, monkeypatch):
+    from cache import ResponseCache
+
+    monkeypatch.setattr(main, "response_cache", ResponseCache(shared_path=str(tmp_path / "cache.db")))
+    offloaded = []
+    original = main.run_in_threadpool
+
+    async def counting(func, *args):
+        offloaded.append(func.__name__)
+        return await original(func, *args)
+
+    monkeypatch.setattr(main, "run_in_threadpool", counting)
+    first = client.post("/categorize", json={"text": "add coffee 150"}).json()
+    assert client.post("/categorize", json={"text": "add coffee 150"}).json() == first
+    assert client.post("/parse-voice-input", json={"text": "taxi 200"}).json()["category"] == "travel"
+    assert offloaded == ["get_or_compute"] * 3
+    assert main.response_cache.stats()["hits"] == 1
+
+
+def test_financial_advice_aggregates_by_category():
+    expenses = [
+        {"category": "food", "amount": 300},
+        {"category": "travel", "amount": 150},
+        {"category": "food", "amount": 200},
+        {"amount": 50},
+    ]
+    response = client.post("/financial-advice", json={
+        "user_query": "how can I save?",
+        "financial_data": {"expenses": expenses, "goals": [{"name": "laptop"}]},
+    })
+    assert response.status_code == 200
+    insights = response.json()["category_insights"]
+    assert insights == [
+        {"category": "food", "amount": 500.0, "percentage": 71},
+        {"category": "travel", "amount": 150.0, "percentage": 21},
+        {"category": "misc", "amount": 50.0, "percentage": 7},
+    ]
+
+
+def test_financial_advice_accepts_columnar_expenses():
+    rows = client.post("/financial-advice", json={
+        "user_query": "help",
+        "financial_data": {"expenses": [{"category": "food", "amount": "300", "note": "ignored"},
+                                        {"category": "travel", "amount": 150}]},
+    })
+    columns = client.post("/financial-advice", json={
+        "user_query": "help",
+        "financial_data": {"amounts": [300, 150], "categories": ["food", "travel"]},
+    })
+    assert columns.status_code == 200
+    assert columns.json()["category_insights"] == rows.json()["category_insights"]
+
+    mixed = client.post("/financial-advice", json={
+        "user_query": "help",
+        "financial_data": {"expenses": [{"category": "food", "amount": 100}],
+                           "amounts": [50], "categories": ["food"]},
+    })
+    assert mixed.json()["category_insights"] == [{"category": "food", "amount": 150.0, "percentage": 100}]
+
+    mismatched = client.post("/financial-advice", json={
+        "user_query": "help", "financial_data": {"amounts": [1, 2], "categories": ["food"]}})
+    assert mismatched.status_code == 422
+
+
+def test_financial_advice_uses_dated_trends(monkeypatch):
+    amounts, categories, dates = [], [], []
+    day = date(2025, 1, 1)
+    while day <= date(2025, 4, 30):
+        # Coffee doubles in April, the last complete month
+        amounts += [100.0, 40.0 if day.month == 4 else 20.0]
+        categories += ["rent", "coffee"]
+        dates += [day.isoformat()] * 2
+        day += timedelta(days=1)
+    monkeypatch.setattr(main.random, "choice", lambda candidates: " | ".join(candidates))
+    response = client.post("/financial-advice", json={
+        "user_query": "help", "financial_data": {"amounts": amounts, "categories": categories, "dates": dates}})
+    assert response.status_code == 200
+    trends = response.json()["trends"]
+    assert trends["last_month"] == "2025-04"
+    assert trends["categories"][1]["vs_average"] == 100
+    assert "Your spending in coffee is 100% higher than average" in response.json()["advice"]
+    assert "I notice you spent 3000.0 on rent last month" in response.json()["advice"]
+
+    mismatched = client.post("/financial-advice", json={
+        "user_query": "help", "financial_data": {"amounts": [1], "categories": ["food"], "dates": []}})
+    assert mismatched.status_code == 422
+    # A date that is not ISO leaves the expense undated instead of failing the request
+    undated = client.post("/financial-advice", json={
+        "user_query": "help", "financial_data": {"expenses": [{"amount": 1, "date": "15/01/2024"}]}})
+    assert undated.status_code == 200
+    assert undated.json()["trends"] is None
+
+
+def test_financial_advice_plans_goals(monkeypatch):
+    monkeypatch.setattr(main.random, "choice", lambda candidates: " | ".join(candidates))
+    deadline = date.today().replace(day=1) + timedelta(days=800)
+    response = client.post("/financial-advice", json={"user_query": "help", "financial_data": {
+        "amounts": [6000, 2000, 3000], "categories": ["food", "travel", "bills"], "monthly_income": 12000,
+        "goals": [{"name": "car", "target_amount": 60000, "saved": 5000, "deadline": deadline.isoformat()},
+                  {"name": "retirement", "target_amount": 1000000, "investment_type": "stocks"},
+                  {"name": "someday"}],
+        "scenarios": [{"name": "frugal", "spending_cut": 0.2}, {"monthly_savings": 0}],
+    }})
+    assert response.status_code == 200
+    plan = response.json()["goal_plan"]
+    assert plan["monthly_savings"] == 1000.0
+    assert plan["gap"] == pytest.approx(plan["required_monthly_savings"] - 1000, abs=0.01)
+    assert plan["cuts"][0]["category"] == "food" and plan["shortfall"] == 0
+    car, retirement = plan["goals"]
+    assert car["required_monthly_savings"] > 2000 and car["monthly_contribution"] == 1000.0
+    assert retirement["expected_return"] == round(main.get_predictor().expected_annual_return("stocks"), 4)
+    assert [s["name"] for s in plan["scenarios"]] == ["current", "frugal", "scenario 2"]
+    # Without deposits the car only gets there through interest on what is saved
+    assert plan["scenarios"][2]["projected_completion"][1] is None
+    assert plan["scenarios"][2]["goals_on_track"] == 0
+    advice = response.json()["advice"]
+    assert f"To reach your car goal by {deadline.isoformat()}, set aside" in advice
+    assert "Cutting food by" in advice
+
+    no_targets = client.post("/financial-advice", json={"user_query": "help", "financial_data": {
+        "expenses": [{"category": "food", "amount": 100}], "goals": [{"name": "laptop"}]}})
+    assert no_targets.json()["goal_plan"] is None
+    invalid = client.post("/financial-advice", json={"user_query": "help", "financial_data": {
+        "goals": [{"target_amount": 100, "investment_type": "crypto"}]}})
+    assert invalid.status_code == 422
+
+
+def test_financial_advice_stream_matches_json_endpoint():
+    expenses = [{"category": ["food", "bills", "travel"][i % 3], "amount": i} for i in range(25000)]
+    body = json.dumps({"goals": [{"name": "car"}]}) + "\n" + "\n".join(json.dumps(e) for e in expenses)
+    streamed = client.post("/financial-advice/stream?user_query=help", content=body,
+                           headers={"content-type": "application/x-ndjson"})
+    regular = client.post("/financial-advice", json={
+        "user_query": "help", "financial_data": {"expenses": expenses}})
+    assert streamed.status_code == 200
+    assert streamed.json()["category_insights"] == regular.json()["category_insights"]
+    assert streamed.json()["goal_plan"] is None
+
+
+def test_financial_advice_stream_rejects_invalid_goals():
+    for goals in (5, [1], "car", [{"target_amount": -5}]):
+        body = json.dumps({"goals": goals}) + "\n" + json.dumps({"category": "food", "amount": 1})
+        response = client.post("/financial-advice/stream", content=body,
+                               headers={"content-type": "application/x-ndjson"})
+        assert response.status_code == 400
+    too_long = json.dumps({"category": "food", "amount": 1, "note": "x" * 70000})
+    response = client.post("/financial-advice/stream", content=too_long,
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 400
+    assert "longer than" in response.json()["detail"]
+
+
+def test_ledger_rollups_feed_financial_advice(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "ledger", ExpenseLedger(str(tmp_path / "ledger.db")))
+    response = client.post("/ledger/u1/voice", json={"text": "add dinner 300"})
+    assert response.status_code == 200
+    assert response.json()["category"] == "food"
+    client.post("/ledger/u1/expenses", json={"expenses": [
+        {"description": "uber to office", "amount": 150, "date": "2026-09-03"},
+        {"description": "groceries", "amount": 200, "category": "food", "date": "2026-10-01"},
+    ]})
+
+    summary = client.get("/ledger/u1/summary").json()
+    assert summary["count"] == 3
+    assert summary["total"] == 650
+    assert summary["categories"][0] == {"category": "food", "total": 500, "count": 2}
+    assert summary["months"]["2026-09"] == {"travel": 150}
+
+    advice = client.post("/financial-advice", json={"user_query": "help", "user_id": "u1"}).json()
+    assert advice["category_insights"] == [
+        {"category": "food", "amount": 500, "percentage": 77},
+        {"category": "travel", "amount": 150, "percentage": 23},
+    ]
+    # Trends come from the ledger's expense dates
+    assert advice["trends"]["categories"][1]["category"] == "travel"
+    assert advice["trends"]["end"] >= "2026-10-01"
+    assert main.ledger.daily_totals("u1")[1][-2:] == ["2026-09-03", "2026-10-01"]
+    assert client.get("/ledger/nobody/summary").json()["count"] == 0
+
+
+def test_ledger_rejects_invalid_dates(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "ledger", ExpenseLedger(str(tmp_path / "ledger.db")))
+    response = client.post("/ledger/u1/expenses", json={"expenses": [
+        {"description": "tea", "amount": 10, "date": "yesterday"}]})
+    assert response.status_code == 422
+    with pytest.raises(ValueError):
+        main.ledger.append("u1", [{"description": "tea", "amount": 10, "date": "2026-13-01"}])
+    main.ledger.append("u1", [{"description": "tea", "amount": 10, "date": "2026-01-02T09:30:00"}])
+    assert main.ledger.summary("u1")["months"] == {"2026-01": {"misc": 10}}
+
+
+def test_ledger_backfills_daily_rollups(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    ledger = ExpenseLedger(path)
+    ledger.append("u1", [{"description": "tea", "amount": 10, "category": "food", "date": "2026-01-02"},
+                         {"description": "bus", "amount": 5, "category": "travel", "date": "2026-01-02"},
+                         {"description": "tea", "amount": 10, "category": "food", "date": "2026-01-02"}])
+    expected = ledger.daily_totals("u1")
+    assert expected == (["food", "travel"], ["2026-01-02", "2026-01-02"], [20.0, 5.0])
+    with ledger._conn:
+        ledger._conn.execute("DELETE FROM daily_rollups")
+    ledger.close()
+    assert ExpenseLedger(path).daily_totals("u1") == expected
+
+
+def test_import_statement_streams_categorized_rows():
+    rows = "".join(f"2024-01-{1 + i % 28:02d},{['Dinner', 'Uber ride', 'Salary'][i % 3]} {i},"
+                   f"{'' if i % 3 == 2 else 100},{100 if i % 3 == 2 else ''}\n" for i in range(2500))
+    statement = "Date,Description,Debit,Credit\n" + rows + "not a date,Uber,5,\n"
+    response = client.post("/import-statement", files={"file": ("statement.csv", statement, "text/csv")})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    *lines, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 2501
+    assert lines[0] == {"line": 2, "date": "2024-01-01", "description": "Dinner 0", "amount": 100.0,
+                        "type": "debit", "category": "food"}
+    assert lines[-1] == {"line": 2502, "error": "invalid date 'not a date'"}
+    assert summary == {
+        "totals": [{"category": "food", "amount": 83400.0, "count": 834},
+                   {"category": "travel", "amount": 83300.0, "count": 833}],
+        "transactions": 2500, "errors": 1, "format": "csv"}
+
+    # A raw body works too, and an upload that is not a statement is rejected
+    raw = client.post("/import-statement", content="Date,Description,Amount\n2024-01-05,Uber,-300\n")
+    assert json.loads(raw.text.splitlines()[0])["category"] == "travel"
+    unreadable = client.post("/import-statement", content="hello\nworld\n")
+    assert unreadable.status_code == 400
+    assert "no header row" in unreadable.json()["detail"]
+    assert client.post("/import-statement?format=pdf", content="x").status_code == 422
+    no_boundary = client.post("/import-statement", content=b"x", headers={"content-type": "multipart/form-data"})
+    assert no_boundary.status_code == 400
+
+
+def test_prediction_returns_503_when_pool_is_saturated(monkeypatch):
+    saturated = PredictionOffloader(main.get_predictor(), max_workers=0, max_queue=0)
+    saturated.in_flight = saturated.capacity
+    monkeypatch.setattr(main, "offloader", saturated)
+    response = client.post("/predict-stocks", json={"investment_amount": 1000, "investment_type": "stocks"})
+    assert response.status_code == 503
+    assert saturated.stats()["rejected"] == 1
+
+
+
+def test_prediction_pool_is_rebuilt_after_a_worker_dies(monkeypatch):
+    pool = PredictionOffloader(main.get_predictor(), max_workers=1, max_queue=4)
+    pool.warm_up()
+    monkeypatch.setattr(main, "offloader", pool)
+    monkeypatch.setenv("WARM_UP", "0")
+    # One event loop thread for the whole test, as under uvicorn: workers
+    # exit with the thread that started them
+    with TestClient(app) as loop_client:
+        worker = next(iter(pool._pool._processes.values()))
+        os.kill(worker.pid, signal.SIGKILL)
+        worker.join(10)
+        simulation = {"investment_amount": 1000, "investment_type": "stocks", "n_paths": 100}
+        response = loop_client.post("/simulate-investment", json=simulation)
+        assert response.status_code == 503
+        assert "restarted" in response.json()["detail"]
+        # The replacement pool serves every later request
+        for path in ("/simulate-investment", "/predict-stocks", "/simulate-investment"):
+            assert loop_client.post(path, json=simulation).status_code == 200, path
+        assert pool.stats()["restarts"] == 1
+
+
+PARSE_ROLE_SCRIPT = """
+import sys
+from fastapi.testclient import TestClient
+import main
+client = TestClient(main.app)
+assert client.post("/categorize", json={"text": "add taxi 150"}).json()["category"] == "travel"
+assert client.post("/predict-stocks", json={"investment_amount": 1000, "investment_type": "stocks"}).status_code == 404
+print(sorted(name for name in ("numpy", "pandas", "predictor", "uvicorn") if name in sys.modules))
+"""
+
+
+def test_parse_role_serves_parsing_without_heavy_imports(tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    env = dict(os.environ, WORKER_ROLE="parse", LEDGER_DB_PATH=str(ledger_path))
+    result = subprocess.run([sys.executable, "-c", PARSE_ROLE_SCRIPT], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+    # The ledger is opened by the first ledger request, not at import
+    assert not ledger_path.exists()
+
+
+def test_readiness_reflects_warm_up(monkeypatch):
+    assert client.get("/healthz").json() == {"status": "ok"}
+    monkeypatch.setattr(main, "ready", False)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert set(response.json()["warm"]) == {"rules", "spending", "predictor", "prediction_pool"}
+    monkeypatch.setattr(main, "ready", True)
+    assert client.get("/readyz").status_code == 200
@@ -0,0 +1,48 @@
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+from ledger import ExpenseLedger
+from main import app
+from metrics import Histogram, SamplingProfiler
+
+client = TestClient(app)
+
+
+def test_metrics_endpoint_reports_routes_and_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "ledger", ExpenseLedger(str(tmp_path / "ledger.db")))
+    client.post("/categorize", json={"text": "add lunch 120 at metrics cafe"})
+    client.get("/ledger/metrics-user/summary")
+    body = client.get("/metrics").text
+    assert 'finvoice_request_duration_seconds_count{method="POST",route="/categorize",status="200"}' in body
+    # Path parameters are reported by route template
+    assert 'route="/ledger/{user_id}/summary"' in body
+    assert 'finvoice_stage_duration_seconds_count{operation="categorize",stage="match"}' in body
+    assert "finvoice_cache_requests_total" in body
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "test", ("route",), (0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(("/x",), value)
+    lines = histogram.render()
+    assert 'h_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'h_bucket{route="/x",le="1"} 2' in lines
+    assert 'h_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'h_count{route="/x"} 3' in lines
+
+
+def test_stage_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics.registry, "enabled", False)
+    assert metrics.stage("a", "b") is metrics._NULL_TIMER
+
+
+def test_sampling_profiler_collects_stacks():
+    profiler = SamplingProfiler(interval=0.001).start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    profiler.stop()
+    assert "test_sampling_profiler_collects_stacks" in profiler.folded()
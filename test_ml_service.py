@@ -16,12 +16,12 @@ def test_stock_prediction():
         if response.status_code == 200:
             data = response.json()
             print("✅ Stock Prediction Test PASSED")
-            print(f"   Investment: ₹{data['currentValue']:,.0f}")
-            print(f"   Predicted Return: {data['predictedReturn']*100:.1f}%")
-            print(f"   Predicted Value: ₹{data['predictedValue']:,.0f}")
+            print(f"   Investment: ₹{data['current_value']:,.0f}")
+            print(f"   Predicted Return: {data['predicted_return']*100:.1f}%")
+            print(f"   Predicted Value: ₹{data['predicted_value']:,.0f}")
             print(f"   Confidence: {data['confidence']*100:.0f}%")
-            print(f"   Risk Level: {data['riskLevel']}")
-            print(f"   Market Sentiment: {data['marketSentiment']}")
+            print(f"   Risk Level: {data['risk_level']}")
+            print(f"   Market Sentiment: {data['market_sentiment']}")
             print(f"   Recommendation: {data['recommendation']}")
         else:
             print(f"❌ Stock Prediction Test FAILED: {response.status_code}")
@@ -41,12 +41,12 @@ def test_gold_prediction():
         if response.status_code == 200:
             data = response.json()
             print("\n✅ Gold Prediction Test PASSED")
-            print(f"   Investment: ₹{data['currentValue']:,.0f}")
-            print(f"   Predicted Return: {data['predictedReturn']*100:.1f}%")
-            print(f"   Predicted Value: ₹{data['predictedValue']:,.0f}")
+            print(f"   Investment: ₹{data['current_value']:,.0f}")
+            print(f"   Predicted Return: {data['predicted_return']*100:.1f}%")
+            print(f"   Predicted Value: ₹{data['predicted_value']:,.0f}")
             print(f"   Confidence: {data['confidence']*100:.0f}%")
-            print(f"   Risk Level: {data['riskLevel']}")
-            print(f"   Market Sentiment: {data['marketSentiment']}")
+            print(f"   Risk Level: {data['risk_level']}")
+            print(f"   Market Sentiment: {data['market_sentiment']}")
             print(f"   Recommendation: {data['recommendation']}")
         else:
             print(f"❌ Gold Prediction Test FAILED: {response.status_code}")
@@ -66,9 +66,9 @@ def test_general_prediction():
         if response.status_code == 200:
             data = response.json()
             print("\n✅ General Investment Prediction Test PASSED")
-            print(f"   Investment: ₹{data['currentValue']:,.0f}")
-            print(f"   Predicted Return: {data['predictedReturn']*100:.1f}%")
-            print(f"   Predicted Value: ₹{data['predictedValue']:,.0f}")
+            print(f"   Investment: ₹{data['current_value']:,.0f}")
+            print(f"   Predicted Return: {data['predicted_return']*100:.1f}%")
+            print(f"   Predicted Value: ₹{data['predicted_value']:,.0f}")
         else:
             print(f"❌ General Investment Prediction Test FAILED: {response.status_code}")
             print(response.text)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from predictor import InvestmentPredictor, ReturnStats, parse_timeframe_months
+
+
+def test_stats_are_cached_until_history_is_replaced():
+    predictor = InvestmentPredictor()
+    stats = predictor.stock_stats()
+    assert predictor.stock_stats() is stats
+    assert stats == ReturnStats.from_prices(predictor.stock_historical_data['nifty50'])
+
+    predictor.stock_historical_data = {'nifty50': [100, 110, 121]}
+    assert predictor.stock_stats().mean == pytest.approx(0.1)
+    assert predictor.gold_stats() is predictor.gold_stats()
+
+
+def test_history_cannot_be_mutated_in_place():
+    predictor = InvestmentPredictor()
+    with pytest.raises(TypeError):
+        predictor.gold_historical_data['price_per_gram'] = [1, 2, 3]
+
+
+def test_batch_matches_scalar_path_with_same_seed():
+    predictor = InvestmentPredictor()
+    amounts = [1000.0, 50000.0, 2500.5, 10.0] * 50
+    types = ["stocks", "gold", "Stocks", "gold"] * 50
+    timeframes = ["1 year", "6 months", "2 years", "1 year"] * 50
+
+    batch = predictor.predict_batch(amounts, types, timeframes, np.random.default_rng(42))
+
+    rng = np.random.default_rng(42)
+    for amount, asset, timeframe, predicted in zip(amounts, types, timeframes, batch):
+        if asset.lower() == "stocks":
+            expected = predictor.predict_stock_returns(amount, timeframe, rng)
+        else:
+            expected = predictor.predict_gold_returns(amount, timeframe, rng)
+        assert predicted == expected
+
+
+def test_batch_rejects_unknown_asset_type():
+    with pytest.raises(ValueError):
+        InvestmentPredictor().predict_batch([100.0], ["crypto"], ["1 year"])
+
+
+def test_simulation_is_reproducible_and_honours_timeframe():
+    predictor = InvestmentPredictor()
+    first = predictor.simulate_returns(10000, "stocks", "5 years", n_paths=2000, seed=3)
+    assert first == predictor.simulate_returns(10000, "stocks", "5 years", n_paths=2000, seed=3)
+    assert first["months"] == 60
+
+    short = predictor.simulate_returns(10000, "stocks", "6 months", n_paths=2000, seed=3)
+    assert short["percentiles"]["p50"] < first["percentiles"]["p50"]
+    percentiles = first["percentiles"]
+    assert percentiles["p5"] <= percentiles["p50"] <= percentiles["p95"]
+    assert 0.0 <= first["probability_of_loss"] <= 1.0
+
+
+def test_parse_timeframe_months():
+    assert parse_timeframe_months("1 year") == 12
+    assert parse_timeframe_months("18 months") == 18
+    assert parse_timeframe_months("2.5 yrs") == 30
+    with pytest.raises(ValueError):
+        parse_timeframe_months("soon")
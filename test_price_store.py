@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from predictor import InvestmentPredictor, ReturnStats
+from price_store import PriceStore
+
+
+def make_prices(days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2020-01-01") + np.arange(days)
+    closes = 100 * np.cumprod(1 + rng.normal(0.0005, 0.01, len(dates)))
+    return dates, closes
+
+
+def test_window_stats_match_direct_computation(tmp_path):
+    store = PriceStore(str(tmp_path))
+    dates, closes = make_prices(500)
+    assert store.append("nifty50", dates, closes) == 500
+
+    returns = np.diff(closes) / closes[:-1]
+    count, mean, std = store.window_stats("nifty50")
+    assert count == 499
+    assert mean == pytest.approx(returns.mean())
+    assert std == pytest.approx(returns.std())
+
+    count, mean, std = store.window_stats("nifty50", window=60)
+    assert count == 60
+    assert mean == pytest.approx(returns[-60:].mean())
+    assert std == pytest.approx(returns[-60:].std())
+
+    count, mean, _ = store.window_stats("nifty50", start=dates[100], end=dates[199])
+    assert count == 99
+    assert mean == pytest.approx(returns[100:199].mean())
+
+    rolling_mean, rolling_std = store.rolling_stats("nifty50", 20)
+    assert rolling_mean[-1] == pytest.approx(returns[-20:].mean())
+    assert rolling_std[0] == pytest.approx(returns[:20].std())
+
+
+def test_incremental_append_matches_bulk_load(tmp_path):
+    dates, closes = make_prices(300)
+    bulk = PriceStore(str(tmp_path / "bulk"))
+    bulk.append("gold", dates, closes)
+
+    incremental = PriceStore(str(tmp_path / "incremental"))
+    incremental.append("gold", dates[:200], closes[:200])
+    incremental.window_stats("gold")
+    for date, close in zip(dates[200:], closes[200:]):
+        incremental.append("gold", [date], [close])
+    # Dates already stored are ignored
+    assert incremental.append("gold", dates[:10], closes[:10]) == 0
+
+    assert incremental.version("gold") == 300
+    assert incremental.window_stats("gold") == pytest.approx(bulk.window_stats("gold"))
+    assert incremental.offset("gold", dates[250]) == 250
+
+
+def test_ingest_csv_and_predictor_uses_store(tmp_path):
+    dates, closes = make_prices(100)
+    csv_path = tmp_path / "prices.csv"
+    csv_path.write_text("date,close,symbol\n" + "".join(
+        f"{date},{close},nifty50\n" for date, close in zip(dates, closes)))
+
+    store = PriceStore(str(tmp_path / "store"))
+    assert store.ingest_csv(str(csv_path)) == {"nifty50": 100}
+
+    predictor = InvestmentPredictor(price_store=store)
+    expected = ReturnStats.from_daily_moments(*store.window_stats("nifty50"))
+    assert predictor.stock_stats() == expected
+    # No gold in the store: the built-in series is used
+    assert predictor.gold_stats() == ReturnStats.from_prices(predictor.gold_historical_data["price_per_gram"])
+
+    store.append("nifty50", [dates[-1] + 1], [closes[-1] * 1.5])
+    assert predictor.stock_stats() != expected
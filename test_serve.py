@@ -0,0 +1,78 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz") as response:
+                return json.loads(response.read())
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def categorize(port, text):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/categorize", data=json.dumps({"text": text}).encode(),
+                                     headers={"content-type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def worker_pids(parent):
+    """PIDs of the processes whose parent is ``parent``, read from /proc"""
+    pids = set()
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; the parent PID follows the state after it
+        if int(stat.rsplit(")", 1)[1].split()[1]) == parent:
+            pids.add(int(entry))
+    return pids
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+
+def test_prefork_launcher_reload_and_shutdown(tmp_path):
+    from benchmark import _free_port
+
+    port = _free_port()
+    env = dict(os.environ, WORKER_ROLE="parse", LEDGER_DB_PATH=str(tmp_path / "ledger.db"))
+    server = subprocess.Popen([sys.executable, os.path.join(HERE, "serve.py"), "--workers", "2", "--host", "127.0.0.1",
+                               "--port", str(port), "--log-level", "warning"], env=env, cwd=str(tmp_path))
+    try:
+        assert wait_ready(port)["ready"] is True
+        assert categorize(port, "add uber 150")["category"] == "travel"
+        wait_for(lambda: len(worker_pids(server.pid)) == 2)
+        old = worker_pids(server.pid)
+
+        # A reload replaces every worker with a new generation
+        server.send_signal(signal.SIGHUP)
+        wait_for(lambda: len(worker_pids(server.pid)) == 2 and not worker_pids(server.pid) & old)
+        assert categorize(port, "add pizza 300")["category"] == "food"
+        assert server.poll() is None
+
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
@@ -0,0 +1,98 @@
+import pytest
+
+from statement import MultipartFileReader, StatementError, StatementReader, parse_amount
+
+BANK_CSV = b"""Account,XXXX1234
+Period,01/01/2024 - 31/01/2024
+
+Txn Date,Narration,Withdrawal Amt.,Deposit Amt.,Balance
+05/01/2024,"UPI/SWIGGY/food
+order",450.00,,"9,550.00"
+06/01/2024,SALARY,,"50,000.00",59550
+07/01/2024,UBER TRIP,abc,,1
+2024-01-08,NETFLIX,199,,1
+"""
+
+OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000[-5:EST]
+<TRNAMT>-150.00
+<NAME>UBER &amp; CO
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>2000<MEMO>Salary</STMTTRN>
+<STMTTRN><TRNAMT>5</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def read(data: bytes, chunk_size: int, statement_format=None):
+    reader = StatementReader(statement_format)
+    rows = []
+    for start in range(0, len(data), chunk_size):
+        rows += reader.feed(data[start:start + chunk_size])
+    return rows + reader.finish()
+
+
+def test_parse_amount():
+    assert parse_amount("-150.5") == -150.5
+    assert parse_amount(" 1,200.00 Dr") == -1200.0
+    assert parse_amount("₹ 300 Cr") == 300.0
+    assert parse_amount("(5)") == -5.0
+    assert parse_amount("INR 20") == 20.0
+    assert parse_amount("  ") is None
+    with pytest.raises(ValueError, match="invalid amount 'abc'"):
+        parse_amount("abc")
+
+
+def test_csv_rows_do_not_depend_on_chunking():
+    expected = [
+        {"line": 5, "date": "2024-01-05", "description": "UPI/SWIGGY/food order", "amount": 450.0, "type": "debit"},
+        {"line": 7, "date": "2024-01-06", "description": "SALARY", "amount": 50000.0, "type": "credit"},
+        {"line": 8, "error": "invalid amount 'abc'"},
+        {"line": 9, "date": "2024-01-08", "description": "NETFLIX", "amount": 199.0, "type": "debit"},
+    ]
+    for chunk_size in (1, 7, 64, len(BANK_CSV)):
+        assert read(BANK_CSV, chunk_size) == expected, chunk_size
+    # Windows line endings, no trailing newline, a signed amount column and a type column
+    crlf = b"Date,Description,Amount,Type\r\n2024-01-05,Coffee,150,DR\r\n2024-01-06,Refund,-20,CR"
+    assert [(row["amount"], row["type"]) for row in read(crlf, 5)] == [(150.0, "debit"), (20.0, "credit")]
+
+
+def test_ofx_transactions():
+    expected = [
+        {"line": 5, "date": "2024-01-05", "description": "UBER & CO", "amount": 150.0, "type": "debit"},
+        {"line": 11, "date": "2024-01-06", "description": "Salary", "amount": 2000.0, "type": "credit"},
+        {"line": 12, "error": "missing DTPOSTED"},
+    ]
+    for chunk_size in (3, 50, len(OFX)):
+        assert read(OFX, chunk_size) == expected, chunk_size
+
+
+def test_unreadable_statements():
+    with pytest.raises(StatementError, match="no header row"):
+        read(b"hello\nworld\n", 4)
+    with pytest.raises(StatementError, match="never ends"):
+        read(b'Date,Description,Amount\n2024-01-05,"coffee,150\n', 8)
+    with pytest.raises(StatementError, match="format must be"):
+        StatementReader("pdf")
+
+
+def test_multipart_file_reader():
+    body = (b'--xyz\r\ncontent-disposition: form-data; name="note"\r\n\r\nignored\r\n'
+            b'--xyz\r\ncontent-disposition: form-data; name="file"; filename="jan.csv"\r\n'
+            b'content-type: text/csv\r\n\r\n' + BANK_CSV + b'\r\n--xyz--\r\n')
+    upload = MultipartFileReader("multipart/form-data; boundary=xyz")
+    data = b"".join(upload.feed(body[start:start + 10]) for start in range(0, len(body), 10))
+    upload.finish()
+    assert (upload.filename, data) == ("jan.csv", BANK_CSV)
+
+    empty = MultipartFileReader("multipart/form-data; boundary=xyz")
+    empty.feed(b'--xyz\r\ncontent-disposition: form-data; name="note"\r\n\r\nhi\r\n--xyz--\r\n')
+    with pytest.raises(StatementError, match="no file part"):
+        empty.finish()
+    with pytest.raises(StatementError, match="boundary"):
+        MultipartFileReader("multipart/form-data")
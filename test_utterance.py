@@ -0,0 +1,98 @@
+from fastapi.testclient import TestClient
+
+from categorizer import ExpenseCategorizer
+from main import app
+from utterance import MAX_UTTERANCE_WORDS, MAX_WORD_CHARS, UtteranceSplitter, parse_utterance
+
+client = TestClient(app)
+
+# (utterance, expected verb, amount, description)
+CORPUS = [
+    ("add dinner 300", "add", 300.0, "dinner"),
+    ("add taxi 150", "add", 150.0, "taxi"),
+    ("add netflix 199", "add", 199.0, "netflix"),
+    ("add dinner at restaurant 300", "add", 300.0, "dinner at restaurant"),
+    ("Add Coffee 45.50", "add", 45.5, "coffee"),
+    ("uber 150", None, 150.0, "uber"),
+    ("spent ₹300 on groceries", "spent", 300.0, "on groceries"),
+    ("paid rs. 1,200 for electricity bill", "paid", 1200.0, "for electricity bill"),
+    ("add 1,20,000 car service", "add", 120000.0, "car service"),
+    ("add 5k rent", "add", 5000.0, "rent"),
+    ("bought laptop for 1.5 lakh", "bought", 150000.0, "laptop for"),
+    ("add coffee, 150.", "add", 150.0, "coffee"),
+    ("add medicine 150/-", "add", 150.0, "medicine"),
+    ("paid 500 rupees for gym", "paid", 500.0, "for gym"),
+    ("add 5 kg rice 300", "add", 5.0, "kg rice 300"),
+    ("add address change fee 150", "add", 150.0, "address change fee"),
+    ("padded envelope 20", None, 20.0, "padded envelope"),
+    ("add taxi", "add", None, "taxi"),
+    ("", None, None, ""),
+]
+
+
+def test_corpus():
+    for text, verb, amount, description in CORPUS:
+        utterance = parse_utterance(text)
+        assert (utterance.verb, utterance.amount, utterance.description) == (verb, amount, description), text
+
+
+def test_all_parsing_paths_agree():
+    categorizer = ExpenseCategorizer()
+    for text, _, amount, description in CORPUS:
+        category = categorizer.categorize(description)
+        expected = {"description": description, "amount": amount, "category": category}
+        assert categorizer.parse_voice_input(text) == (description, amount, category), text
+        assert client.post("/parse-voice-input", json={"text": text}).json() == expected, text
+        assert client.post("/categorize", json={"text": text}).json() == expected, text
+
+
+def test_parse_utterance_fills_category():
+    categorizer = ExpenseCategorizer()
+    assert parse_utterance("add uber 150", categorizer.categorize).category == "travel"
+    assert parse_utterance("add uber 150").category is None
+
+
+def test_splitter_completes_expenses_incrementally():
+    splitter = UtteranceSplitter()
+    assert splitter.feed("add coffee 1") == []
+    assert splitter.feed("50 and ta") == ["add coffee 150"]
+    assert splitter.feed("xi 300, bread and butter 50; paid rs. 1,200 for gro") == ["taxi 300", "bread and butter 50"]
+    assert splitter.feed("ceries ") == []
+    assert splitter.flush() == ["paid rs. 1,200 for groceries"]
+    assert splitter.flush() == []
+    # Separators before the amount belong to the description
+    assert splitter.feed("add coffee, 150. ") == ["add coffee, 150"]
+    assert splitter.feed("salt and pepper") == [] and splitter.flush() == ["salt and pepper"]
+
+
+def test_splitter_bounds_buffered_words():
+    splitter = UtteranceSplitter()
+    done = splitter.feed("word " * (MAX_UTTERANCE_WORDS + 1))
+    assert done == [" ".join(["word"] * MAX_UTTERANCE_WORDS)]
+    assert splitter.flush() == ["word"]
+    # A word that never ends is cut once it outgrows MAX_WORD_CHARS
+    done = []
+    for _ in range(MAX_UTTERANCE_WORDS * (MAX_WORD_CHARS + 1)):
+        done += splitter.feed("x")
+        assert len(splitter._partial) <= MAX_WORD_CHARS
+    assert done == [" ".join(["x" * (MAX_WORD_CHARS + 1)] * MAX_UTTERANCE_WORDS)]
+
+
+def test_voice_stream_websocket():
+    with client.websocket_connect("/parse-voice-input/stream") as websocket:
+        websocket.send_text('{"text": "add coffee 1", "final": false}')
+        websocket.send_text('{"text": "50 and uber 300, netflix", "final": false}')
+        assert websocket.receive_json() == {
+            "index": 0, "text": "add coffee 150", "description": "coffee", "amount": 150.0, "category": "food"}
+        assert websocket.receive_json()["description"] == "uber"
+        for bad in ("not json", "[1]", '{"text": 5}', '{"text": "' + "x" * 5000 + '"}'):
+            websocket.send_text(bad)
+            assert "error" in websocket.receive_json()
+        websocket.send_text('{"text": " 199"}')
+        assert websocket.receive_json() == {
+            "index": 2, "text": "netflix 199", "description": "netflix", "amount": 199.0, "category": "entertainment"}
+        # Each utterance matches the single-shot endpoint
+        websocket.send_text('{"text": "add dinner at restaurant 300"}')
+        streamed = websocket.receive_json()
+        expected = client.post("/parse-voice-input", json={"text": "add dinner at restaurant 300"}).json()
+        assert {key: streamed[key] for key in expected} == expected
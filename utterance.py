@@ -0,0 +1,150 @@
+"""Single-pass tokenizer for spoken expense utterances
+
+The text is lowercased and split once, and every token is classified in
+the same loop: currency words are dropped, the first amount becomes the
+expense amount, the first standalone verb ("add", "spent", ...) is
+recorded as the verb, and the remaining words form the description.
+Amounts may carry a currency marker, thousands separators or a
+multiplier: "300", "₹300", "rs. 1,200", "1,20,000", "5k", "2.5 lakh".
+Only whole tokens are compared, so "address" never loses its "add".
+
+UtteranceSplitter cuts a stream of transcript fragments into one
+utterance per expense ("add coffee 150 and taxi 300").
+"""
+import re
+from typing import Callable, List, NamedTuple, Optional
+
+VERBS = frozenset({"add", "added", "spent", "spend", "paid", "pay", "bought", "buy", "log", "record"})
+
+CURRENCY_WORDS = frozenset({"₹", "$", "rs", "inr", "rupee", "rupees"})
+
+# Multipliers accepted glued to the number ("5k") or as the next word ("5 lakh")
+MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "lac": 1e5, "lakh": 1e5, "lakhs": 1e5}
+
+_AMOUNT = re.compile(r"(?:₹|\$|rs\.?|inr)?(\d{1,3}(?:,\d{2,3})+|\d+)(\.\d+)?(k|thousand|lakhs?|lac)?(?:/-)?")
+
+# First characters of tokens worth running the amount regex on
+_AMOUNT_START = frozenset("0123456789₹$ri")
+
+_TRAILING_PUNCTUATION = ".,!?;:"
+
+# Words and trailing punctuation that end an expense once it has an amount
+SEPARATOR_WORDS = frozenset({"and", "then", "also", "plus"})
+_SEPARATOR_PUNCTUATION = ".,;!?"
+
+# Longest utterance the splitter buffers before cutting it regardless
+MAX_UTTERANCE_WORDS = 64
+
+# Longest unfinished word carried over to the next fragment; a longer one is
+# taken as a whole word, so a stream without spaces is not re-split in full
+# on every fragment
+MAX_WORD_CHARS = 64
+
+
+class ParsedUtterance(NamedTuple):
+    """Verb, amount, description and category extracted from an utterance"""
+
+    verb: Optional[str]
+    amount: Optional[float]
+    description: str
+    category: Optional[str]
+
+
+def parse_utterance(text: str, categorize: Optional[Callable[[str], str]] = None) -> ParsedUtterance:
+    """Tokenize an utterance in one scan; ``categorize`` fills in the category"""
+    verb = None
+    amount = None
+    scalable = False  # the previous token was the amount, so "lakh" may follow
+    words = []
+    for token in text.lower().split():
+        token = token.rstrip(_TRAILING_PUNCTUATION)
+        if not token or token in CURRENCY_WORDS:
+            continue
+        if scalable and token in MULTIPLIERS:
+            amount *= MULTIPLIERS[token]
+            scalable = False
+            continue
+        scalable = False
+        if token[0] in _AMOUNT_START:
+            match = _AMOUNT.fullmatch(token)
+            if match is not None:
+                if amount is None:
+                    number, fraction, suffix = match.groups()
+                    amount = float(number.replace(",", "") + (fraction or ""))
+                    if suffix:
+                        amount *= MULTIPLIERS[suffix]
+                    else:
+                        scalable = True
+                else:
+                    words.append(token)
+                continue
+        if verb is None and token in VERBS:
+            verb = token
+        else:
+            words.append(token)
+
+    description = " ".join(words)
+    category = categorize(description) if categorize is not None else None
+    return ParsedUtterance(verb, amount, description, category)
+
+
+def _is_amount(token: str) -> bool:
+    return token[0] in _AMOUNT_START and _AMOUNT.fullmatch(token) is not None
+
+
+class UtteranceSplitter:
+    """Splits transcript fragments into one utterance per expense, incrementally
+
+    Fragments may break anywhere, even mid-word. A separator word, or a
+    trailing ",", ";" or ".", ends an expense once it has an amount; before
+    that it is part of the description ("bread and butter 50"). Only the
+    unfinished word (at most MAX_WORD_CHARS) and the current expense's
+    words are buffered.
+    """
+
+    __slots__ = ("_partial", "_words", "_has_amount")
+
+    def __init__(self):
+        self._partial = ""
+        self._words: List[str] = []
+        self._has_amount = False
+
+    def feed(self, fragment: str) -> List[str]:
+        """Add a fragment; returns the utterances it completed"""
+        tokens = (self._partial + fragment).split()
+        # A fragment that does not end in whitespace may end mid-word
+        self._partial = tokens.pop() if tokens and not fragment[-1:].isspace() else ""
+        done: List[str] = []
+        for token in tokens:
+            self._add(token, done)
+        if len(self._partial) > MAX_WORD_CHARS:
+            self._add(self._partial, done)
+            self._partial = ""
+        return done
+
+    def flush(self) -> List[str]:
+        """End the current utterance; returns it unless nothing was said"""
+        done: List[str] = []
+        if self._partial:
+            self._add(self._partial, done)
+            self._partial = ""
+        if self._words:
+            self._emit(done)
+        return done
+
+    def _add(self, token: str, done: List[str]):
+        bare = token.lower().rstrip(_TRAILING_PUNCTUATION)
+        if self._has_amount and bare in SEPARATOR_WORDS:
+            self._emit(done)
+            return
+        self._words.append(token)
+        if not self._has_amount and bare and _is_amount(bare):
+            self._has_amount = True
+        if (self._has_amount and token[-1] in _SEPARATOR_PUNCTUATION and bare not in CURRENCY_WORDS) \
+                or len(self._words) >= MAX_UTTERANCE_WORDS:
+            self._emit(done)
+
+    def _emit(self, done: List[str]):
+        done.append(" ".join(self._words).rstrip(_SEPARATOR_PUNCTUATION + " "))
+        self._words = []
+        self._has_amount = False